@@ -7,19 +7,128 @@ load_dotenv()
 # Google Sheets API
 GOOGLE_SHEET_ID = os.getenv("GOOGLE_SHEET_ID")
 GOOGLE_SHEETS_SERVICE_ACCOUNT_FILE = os.getenv("GOOGLE_SHEETS_SERVICE_ACCOUNT_FILE")
+# Extra spreadsheets that take rollover shards once the main workbook is full (comma-separated IDs)
+GOOGLE_SHEET_POOL_IDS = [sheet_id.strip() for sheet_id in os.getenv("GOOGLE_SHEET_POOL_IDS", "").split(",") if sheet_id.strip()]
+# Result sinks: comma-separated mix of sheets, sqlite, parquet and csv; local sinks write below RESULTS_DIR
+RESULT_SINKS = os.getenv("RESULT_SINKS", "sheets")
+RESULTS_DIR = os.getenv("RESULTS_DIR", "data/results")
+# Optional CSV file laid out like the "Search terms" sheet, read instead of the sheet (for offline runs)
+SEARCH_TERMS_FILE = os.getenv("SEARCH_TERMS_FILE")
+# Buffered result writes: rows per append call and age of buffered rows that triggers a flush on the next append
+SHEETS_FLUSH_ROWS = int(os.getenv("SHEETS_FLUSH_ROWS", "500"))
+SHEETS_FLUSH_SECONDS = float(os.getenv("SHEETS_FLUSH_SECONDS", "30"))
+# Workbook cell limit, cells kept free below it, and the minimum number of old rows trimmed at once
+SHEETS_CELL_LIMIT = int(os.getenv("SHEETS_CELL_LIMIT", "10000000"))
+SHEETS_CELL_HEADROOM = int(os.getenv("SHEETS_CELL_HEADROOM", "50000"))
+SHEETS_TRIM_MIN_ROWS = int(os.getenv("SHEETS_TRIM_MIN_ROWS", "1000"))
+# What to do when the workbook is full: "rollover" to a new shard sheet or "trim" the oldest rows
+SHEETS_FULL_POLICY = os.getenv("SHEETS_FULL_POLICY", "rollover").strip().lower()
+SHEETS_SHARD_MAX_CELLS = int(os.getenv("SHEETS_SHARD_MAX_CELLS", "0"))  # Per-shard cell threshold (0 = no limit)
+# Sheets quota errors (429/5xx): retries per write and the lowest write rate the backoff may drop to
+SHEETS_WRITE_RETRIES = int(os.getenv("SHEETS_WRITE_RETRIES", "5"))
+SHEETS_MIN_WRITES_PER_MINUTE = float(os.getenv("SHEETS_MIN_WRITES_PER_MINUTE", "10"))
 
 # Meta API
 META_ACCESS_TOKEN = os.getenv("META_ACCESS_TOKEN")
 META_APP_ID = os.getenv("META_APP_ID")
 META_APP_SECRET = os.getenv("META_APP_SECRET")
+META_FIELD_PROFILE = os.getenv("META_FIELD_PROFILE", "full").strip().lower()  # minimal, creative, reach or full
+if META_FIELD_PROFILE not in ("minimal", "creative", "reach", "full"):
+    print(f"Unknown META_FIELD_PROFILE '{META_FIELD_PROFILE}'. Using 'full'.")
+    META_FIELD_PROFILE = "full"
+# Countries whose age/gender reach breakdown gets "<country> - <age> - <gender>" columns:
+# comma-separated codes, "*" or "all" for every country, empty for the country of the run
+META_BREAKDOWN_ALL_COUNTRIES = os.getenv("META_BREAKDOWN_COUNTRIES", "").strip().lower() in ("*", "all")
+META_BREAKDOWN_COUNTRIES = set() if META_BREAKDOWN_ALL_COUNTRIES else {
+    code.strip().upper() for code in os.getenv("META_BREAKDOWN_COUNTRIES", "").split(",") if code.strip()
+}
 
 # TikTok API
 TIKTOK_ACCESS_TOKEN = os.getenv("TIKTOK_ACCESS_TOKEN")
 TIKTOK_CLIENT_KEY = os.getenv("TIKTOK_CLIENT_KEY")
 TIKTOK_CLIENT_SECRET = os.getenv("TIKTOK_CLIENT_SECRET")
+TIKTOK_QUERY_PAGE_SIZE = int(os.getenv("TIKTOK_QUERY_PAGE_SIZE", "50"))  # max_count per query page (API max 50)
+TIKTOK_DETAIL_WORKERS = int(os.getenv("TIKTOK_DETAIL_WORKERS", "8"))  # Parallel ad detail requests
+TIKTOK_DETAIL_RETRIES = int(os.getenv("TIKTOK_DETAIL_RETRIES", "2"))  # Extra attempts per failed ad
+# Ad detail cache: hours until details of possibly running ads are fetched again (0 = off);
+# ads last shown more than TIKTOK_DETAIL_ENDED_DAYS days ago are cached permanently
+TIKTOK_DETAIL_CACHE_TTL_HOURS = float(os.getenv("TIKTOK_DETAIL_CACHE_TTL_HOURS", "24"))
+TIKTOK_DETAIL_ENDED_DAYS = int(os.getenv("TIKTOK_DETAIL_ENDED_DAYS", "7"))
 
 # Google Ad Library API
 GOOGLE_BIGQUERY_SERVICE_ACCOUNT_FILE = os.getenv("GOOGLE_BIGQUERY_SERVICE_ACCOUNT_FILE")
+GOOGLE_BIGQUERY_COLUMNS = os.getenv("GOOGLE_BIGQUERY_COLUMNS", "full")  # full or trimmed
+# Dry-run cost guard: estimated bytes scanned per query (0 disables the dry run) and "warn" or "refuse"
+GOOGLE_BIGQUERY_MAX_BYTES = int(float(os.getenv("GOOGLE_BIGQUERY_MAX_BYTES", "0")))
+# Download results as Arrow through the Storage Read API (needs pyarrow and google-cloud-bigquery-storage)
+GOOGLE_BIGQUERY_USE_STORAGE_API = os.getenv("GOOGLE_BIGQUERY_USE_STORAGE_API", "false").strip().lower() in ("1", "true", "yes")
+# Where Google lookups run: "bigquery" or "local" (DuckDB snapshot synced with src/google_snapshot.py)
+GOOGLE_ADS_SOURCE = os.getenv("GOOGLE_ADS_SOURCE", "bigquery").strip().lower()
+GOOGLE_SNAPSHOT_PATH = os.getenv("GOOGLE_SNAPSHOT_PATH", "data/google_ads_snapshot.duckdb")
+GOOGLE_BIGQUERY_BUDGET_MODE = os.getenv("GOOGLE_BIGQUERY_BUDGET_MODE", "warn").strip().lower()
+
+# Persistent response cache for ad library queries (SQLite); a TTL of 0 hours disables a platform
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "data/response_cache.sqlite")
+RESPONSE_CACHE_MAX_MB = float(os.getenv("RESPONSE_CACHE_MAX_MB", "500"))
+RESPONSE_CACHE_TTL_HOURS = {
+    "meta": float(os.getenv("RESPONSE_CACHE_TTL_META_HOURS", "6")),
+    "tiktok": float(os.getenv("RESPONSE_CACHE_TTL_TIKTOK_HOURS", "24")),
+    "google": float(os.getenv("RESPONSE_CACHE_TTL_GOOGLE_HOURS", "24")),
+}
+
+# Incremental runs: per-term watermarks (SQLite) and how many days before a watermark a fetch resumes
+CRAWL_STATE_PATH = os.getenv("CRAWL_STATE_PATH", "data/crawl_state.sqlite")
+INCREMENTAL_OVERLAP_DAYS = int(os.getenv("INCREMENTAL_OVERLAP_DAYS", "1"))
+
+# Concurrent crawler mode: maximum parallel requests per platform
+META_MAX_CONCURRENCY = int(os.getenv("META_MAX_CONCURRENCY", "2"))
+TIKTOK_MAX_CONCURRENCY = int(os.getenv("TIKTOK_MAX_CONCURRENCY", "2"))
+GOOGLE_MAX_CONCURRENCY = int(os.getenv("GOOGLE_MAX_CONCURRENCY", "2"))
+
+# Shared HTTP transport: (connect, read) timeouts, connection pool size and circuit breaker per platform
+PLATFORM_HTTP_SETTINGS = {
+    "meta": {
+        "timeout": (5, float(os.getenv("META_HTTP_TIMEOUT", "60"))),
+        "pool_size": max(4, META_MAX_CONCURRENCY * 2),
+        "failure_threshold": int(os.getenv("META_CIRCUIT_FAILURES", "5")),
+        "cooldown_seconds": float(os.getenv("META_CIRCUIT_COOLDOWN", "60")),
+    },
+    "tiktok": {
+        "timeout": (5, float(os.getenv("TIKTOK_HTTP_TIMEOUT", "30"))),
+        "pool_size": max(4, TIKTOK_MAX_CONCURRENCY * TIKTOK_DETAIL_WORKERS),
+        "failure_threshold": int(os.getenv("TIKTOK_CIRCUIT_FAILURES", "10")),
+        "cooldown_seconds": float(os.getenv("TIKTOK_CIRCUIT_COOLDOWN", "60")),
+    },
+}
+# Adaptive Meta throttling from X-App-Usage / X-Business-Use-Case-Usage headers (percent of quota)
+META_USAGE_CEILING = float(os.getenv("META_USAGE_CEILING", "75"))
+META_MIN_REQUESTS_PER_SECOND = float(os.getenv("META_MIN_REQUESTS_PER_SECOND", "0.05"))
+META_THROTTLE_MAX_PAUSE_SECONDS = float(os.getenv("META_THROTTLE_MAX_PAUSE_SECONDS", "300"))
+META_THROTTLE_RETRIES = int(os.getenv("META_THROTTLE_RETRIES", "3"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_BACKOFF_BASE_SECONDS = float(os.getenv("HTTP_BACKOFF_BASE_SECONDS", "1"))
+HTTP_BACKOFF_MAX_SECONDS = float(os.getenv("HTTP_BACKOFF_MAX_SECONDS", "60"))
+
+# Token-bucket rate limits per upstream quota (requests per second, burst size). 0 disables a limiter.
+PLATFORM_RATE_LIMITS = {
+    "meta": {
+        "rate": float(os.getenv("META_REQUESTS_PER_SECOND", "2")),
+        "burst": int(os.getenv("META_REQUEST_BURST", "5")),
+    },
+    "tiktok": {
+        "rate": float(os.getenv("TIKTOK_REQUESTS_PER_SECOND", "5")),
+        "burst": int(os.getenv("TIKTOK_REQUEST_BURST", "10")),
+    },
+    "bigquery": {
+        "rate": float(os.getenv("BIGQUERY_QUERIES_PER_SECOND", "1")),
+        "burst": int(os.getenv("BIGQUERY_QUERY_BURST", "2")),
+    },
+    "sheets": {
+        # Sheets allows 60 write requests per minute per user.
+        "rate": float(os.getenv("SHEETS_WRITES_PER_MINUTE", "60")) / 60,
+        "burst": int(os.getenv("SHEETS_WRITE_BURST", "5")),
+    },
+}
 
 def update_env_file(key, value):
     """ Update .env file with a new key-value pair """
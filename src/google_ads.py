@@ -1,22 +1,33 @@
-from config import GOOGLE_BIGQUERY_SERVICE_ACCOUNT_FILE
+from config import (
+    GOOGLE_BIGQUERY_BUDGET_MODE,
+    GOOGLE_BIGQUERY_COLUMNS,
+    GOOGLE_BIGQUERY_MAX_BYTES,
+    GOOGLE_BIGQUERY_SERVICE_ACCOUNT_FILE,
+    GOOGLE_BIGQUERY_USE_STORAGE_API,
+    GOOGLE_ADS_SOURCE,
+)
 from google.cloud import bigquery
+from google_snapshot import query_snapshot, query_snapshot_batch
+from utils import rate_limit
 import os
+import threading
 
-def query_google_ad_library(term, min_date, max_date, max_results=500, country_code=None):
-    """Query BigQuery and return the results."""
-    try:
-        max_results = int(max_results) if max_results else 500
-        country_code = country_code or "AT"
-        # Optional fallback for local development with a service account key file.
-        credentials_path = GOOGLE_BIGQUERY_SERVICE_ACCOUNT_FILE
-        if credentials_path:
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
+# Optional fast path: Arrow record batches through the BigQuery Storage Read API.
+try:
+    import pyarrow
+    from google.cloud import bigquery_storage
+except ImportError:
+    pyarrow = None
+    bigquery_storage = None
 
-        # If no file is provided, BigQuery client uses ADC (recommended for Cloud Run).
-        client = bigquery.Client()
+_CLIENT = None
+_BQSTORAGE_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
 
-        query = f"""
-SELECT 
+# Selected columns per column set. "trimmed" drops the audience targeting structs,
+# which are the bulk of each row.
+GOOGLE_AD_LIBRARY_COLUMNS = {
+    "trimmed": """
     -- Fields from creative_stats
     creative_stats.advertiser_id,
     creative_stats.creative_id,
@@ -35,38 +46,287 @@ SELECT
     region_stats.times_shown_lower_bound,
     region_stats.times_shown_upper_bound,
     region_stats.times_shown_start_date,
-    region_stats.times_shown_availability_date,
+    region_stats.times_shown_availability_date""",
+}
+GOOGLE_AD_LIBRARY_COLUMNS["full"] = GOOGLE_AD_LIBRARY_COLUMNS["trimmed"] + """,
 
     -- Fields from audience_selection_approach_info (unnested)
     audience_selection_approach_info.demographic_info,
     audience_selection_approach_info.geo_location,
     audience_selection_approach_info.contextual_signals,
     audience_selection_approach_info.customer_lists,
-    audience_selection_approach_info.topics_of_interest
+    audience_selection_approach_info.topics_of_interest"""
+
+# Static SQL text per column set: values are passed as named query parameters, so identical
+# queries can be served from BigQuery's result cache and terms cannot inject SQL.
+# LIMIT and a deterministic ORDER BY keep transferred rows proportional to max_results.
+GOOGLE_AD_LIBRARY_QUERY = """
+SELECT {columns}
 FROM 
     `bigquery-public-data.google_ads_transparency_center.creative_stats` AS creative_stats,
     UNNEST(creative_stats.region_stats) AS region_stats
 WHERE 
     (
-        LOWER(creative_stats.advertiser_disclosed_name) LIKE "%{term}%" OR
-        LOWER(creative_stats.advertiser_legal_name) LIKE "%{term}%"
+        LOWER(creative_stats.advertiser_disclosed_name) LIKE CONCAT("%", LOWER(@term), "%") OR
+        LOWER(creative_stats.advertiser_legal_name) LIKE CONCAT("%", LOWER(@term), "%")
     )
-    AND region_stats.region_code = "{country_code}"
-    AND DATE(region_stats.first_shown) >= DATE("{min_date}")
-    AND DATE(region_stats.last_shown) <= DATE("{max_date}")
+    AND region_stats.region_code = @country_code
+    AND DATE(region_stats.first_shown) >= @min_date
+    AND DATE(region_stats.last_shown) <= @max_date
+ORDER BY region_stats.last_shown DESC, creative_stats.creative_id
+LIMIT @max_results
+"""
+
+# Batched variant: one scan of creative_stats matches every search term. Each term carries its own
+# date window; QUALIFY keeps at most @max_results rows per term with the same ordering as above.
+GOOGLE_AD_LIBRARY_BATCH_QUERY = """
+SELECT
+    search_terms.term_index,
+    search_terms.term AS search_term,{columns}
+FROM 
+    `bigquery-public-data.google_ads_transparency_center.creative_stats` AS creative_stats
+    CROSS JOIN UNNEST(creative_stats.region_stats) AS region_stats
+    JOIN UNNEST(@terms) AS search_terms
+        ON (
+            LOWER(creative_stats.advertiser_disclosed_name) LIKE CONCAT("%", LOWER(search_terms.term), "%") OR
+            LOWER(creative_stats.advertiser_legal_name) LIKE CONCAT("%", LOWER(search_terms.term), "%")
+        )
+        AND DATE(region_stats.first_shown) >= search_terms.min_date
+        AND DATE(region_stats.last_shown) <= search_terms.max_date
+WHERE 
+    region_stats.region_code = @country_code
+QUALIFY ROW_NUMBER() OVER (
+    PARTITION BY search_terms.term_index
+    ORDER BY region_stats.last_shown DESC, creative_stats.creative_id
+) <= @max_results
+"""
+
+# Full copy of one region for the local snapshot (google_snapshot.py), optionally from a last_shown date on.
+GOOGLE_AD_LIBRARY_SYNC_QUERY = """
+SELECT {columns}
+FROM 
+    `bigquery-public-data.google_ads_transparency_center.creative_stats` AS creative_stats,
+    UNNEST(creative_stats.region_stats) AS region_stats
+WHERE 
+    region_stats.region_code = @country_code
+    AND (@start_date IS NULL OR DATE(region_stats.last_shown) >= @start_date)
+"""
+
+
+def column_names(columns=None):
+    """Return the result column names of a column set, e.g. for the local snapshot."""
+    names = []
+    for line in _resolve_columns(columns).splitlines():
+        line = line.strip().rstrip(",")
+        if line and not line.startswith("--"):
+            names.append(line.split(".")[-1])
+    return names
+
+
+def _format_bytes(num_bytes):
+    return f"{num_bytes / 1024 ** 3:.2f} GiB"
+
+
+def check_query_cost(client, query, job_config):
+    """Dry-run a query and compare the estimated bytes scanned with GOOGLE_BIGQUERY_MAX_BYTES.
+
+    Returns False when the query should not run (estimate above budget in "refuse" mode).
+    """
+    if GOOGLE_BIGQUERY_MAX_BYTES <= 0:
+        return True
+
+    dry_run_config = bigquery.QueryJobConfig(
+        query_parameters=job_config.query_parameters,
+        dry_run=True,
+        use_query_cache=False,
+    )
+    rate_limit("bigquery")
+    estimated_bytes = client.query(query, job_config=dry_run_config).total_bytes_processed or 0
+    if estimated_bytes <= GOOGLE_BIGQUERY_MAX_BYTES:
+        return True
+
+    message = (
+        f"BigQuery query would scan {_format_bytes(estimated_bytes)}, "
+        f"above the budget of {_format_bytes(GOOGLE_BIGQUERY_MAX_BYTES)}"
+    )
+    if GOOGLE_BIGQUERY_BUDGET_MODE == "refuse":
+        print(f"{message}. Skipping query.")
+        return False
+    print(f"Warning: {message}.")
+    return True
+
+
+def get_bigquery_client():
+    """Return the process-wide BigQuery client, creating it on first use."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            # Optional fallback for local development with a service account key file.
+            credentials_path = GOOGLE_BIGQUERY_SERVICE_ACCOUNT_FILE
+            if credentials_path:
+                os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
+
+            # If no file is provided, BigQuery client uses ADC (recommended for Cloud Run).
+            _CLIENT = bigquery.Client()
+        return _CLIENT
+
+
+def _resolve_columns(columns):
+    columns = columns or GOOGLE_BIGQUERY_COLUMNS
+    if columns not in GOOGLE_AD_LIBRARY_COLUMNS:
+        raise ValueError(
+            f"Unknown Google column set '{columns}'. Choose one of: {', '.join(GOOGLE_AD_LIBRARY_COLUMNS)}."
+        )
+    return GOOGLE_AD_LIBRARY_COLUMNS[columns]
+
+
+def get_bqstorage_client():
+    """Return the shared Storage Read API client, or None when the fast path is off or unavailable."""
+    global _BQSTORAGE_CLIENT
+    if not GOOGLE_BIGQUERY_USE_STORAGE_API:
+        return None
+    if bigquery_storage is None:
+        print("GOOGLE_BIGQUERY_USE_STORAGE_API is set, but pyarrow/google-cloud-bigquery-storage are not installed.")
+        return None
+    # Sets GOOGLE_APPLICATION_CREDENTIALS for key-file setups before the read client picks up ADC.
+    get_bigquery_client()
+    with _CLIENT_LOCK:
+        if _BQSTORAGE_CLIENT is None:
+            _BQSTORAGE_CLIENT = bigquery_storage.BigQueryReadClient()
+        return _BQSTORAGE_CLIENT
+
+
+def _download_results(query_job):
+    """Download query results as a pyarrow Table over parallel Storage Read streams,
+    or as a list of row dicts when the fast path is not available."""
+    results = query_job.result()
+    bqstorage_client = get_bqstorage_client()
+    if bqstorage_client is not None:
+        return results.to_arrow(bqstorage_client=bqstorage_client)
+    return [dict(row) for row in results]
+
+
+def _split_by_term_index(results, term_count):
+    """Split batched results into one result set per search, dropping the term_index column."""
+    if hasattr(results, "column_names"):
+        positions = [[] for _ in range(term_count)]
+        for position, term_index in enumerate(results.column("term_index").to_pylist()):
+            positions[term_index].append(position)
+        table = results.drop(["term_index"])
+        return [table.take(pyarrow.array(indices, type=pyarrow.int64())) for indices in positions]
+
+    split = [[] for _ in range(term_count)]
+    for row in results:
+        split[row.pop("term_index")].append(row)
+    return split
+
+
+def query_google_ad_library(term, min_date, max_date, max_results=500, country_code=None, columns=None):
+    """Query BigQuery and return at most ``max_results`` rows, newest first.
+
+    Rows are dicts, or a pyarrow Table when GOOGLE_BIGQUERY_USE_STORAGE_API is enabled.
+    Returns None when the cost guard refuses the query.
+
+    ``columns`` selects the "full" or "trimmed" column set (default: GOOGLE_BIGQUERY_COLUMNS).
     """
+    try:
+        max_results = int(max_results) if max_results else 500
+        country_code = country_code or "AT"
+        if GOOGLE_ADS_SOURCE == "local":
+            return query_snapshot(
+                term, min_date, max_date, max_results, country_code, column_names=column_names(columns)
+            )
+        query = GOOGLE_AD_LIBRARY_QUERY.format(columns=_resolve_columns(columns))
+        client = get_bigquery_client()
+
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("term", "STRING", term),
+                bigquery.ScalarQueryParameter("country_code", "STRING", country_code),
+                bigquery.ScalarQueryParameter("min_date", "DATE", min_date),
+                bigquery.ScalarQueryParameter("max_date", "DATE", max_date),
+                bigquery.ScalarQueryParameter("max_results", "INT64", max_results),
+            ],
+            use_query_cache=True,
+        )
+
+        if not check_query_cost(client, query, job_config):
+            return None
 
         # Run the query
-        query_job = client.query(query)
+        rate_limit("bigquery")
+        query_job = client.query(query, job_config=job_config)
 
-        # Wait for the query to finish and fetch results
-        results = query_job.result()
-        
-        # Convert to list to count rows
-        rows = [dict(row) for row in results]
-        rows = rows[:max_results]
-        
-        return rows
+        # Wait for the query to finish and fetch results (already capped by LIMIT)
+        return _download_results(query_job)
 
     except Exception as e:
         raise
+
+
+def query_google_ad_library_batch(searches, max_results=500, country_code=None, columns=None):
+    """Match many search terms against creative_stats in a single BigQuery scan.
+
+    ``searches`` is a list of ``(term, min_date, max_date)``. Returns one list of
+    rows per search, in the order of ``searches``; every row carries the
+    matching ``search_term``. Result sets are pyarrow Tables on the Storage
+    Read API fast path. Every entry is None when the cost guard refuses the query.
+    """
+    max_results = int(max_results) if max_results else 500
+    country_code = country_code or "AT"
+    if not searches:
+        return []
+    if GOOGLE_ADS_SOURCE == "local":
+        return query_snapshot_batch(searches, max_results, country_code, column_names=column_names(columns))
+
+    query = GOOGLE_AD_LIBRARY_BATCH_QUERY.format(columns=_resolve_columns(columns))
+    client = get_bigquery_client()
+    terms_parameter = bigquery.ArrayQueryParameter(
+        "terms",
+        "STRUCT",
+        [
+            bigquery.StructQueryParameter(
+                None,
+                bigquery.ScalarQueryParameter("term_index", "INT64", index),
+                bigquery.ScalarQueryParameter("term", "STRING", term),
+                bigquery.ScalarQueryParameter("min_date", "DATE", min_date),
+                bigquery.ScalarQueryParameter("max_date", "DATE", max_date),
+            )
+            for index, (term, min_date, max_date) in enumerate(searches)
+        ],
+    )
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            terms_parameter,
+            bigquery.ScalarQueryParameter("country_code", "STRING", country_code),
+            bigquery.ScalarQueryParameter("max_results", "INT64", max_results),
+        ],
+        use_query_cache=True,
+    )
+
+    if not check_query_cost(client, query, job_config):
+        return [None for _ in searches]
+
+    rate_limit("bigquery")
+    query_job = client.query(query, job_config=job_config)
+    return _split_by_term_index(_download_results(query_job), len(searches))
+
+
+def sync_region_record_batches(country_code, start_date=None):
+    """Yield Arrow record batches with all full-column rows of one region, for the local snapshot."""
+    if pyarrow is None:
+        raise RuntimeError("Syncing the local Google snapshot needs the 'pyarrow' package.")
+    query = GOOGLE_AD_LIBRARY_SYNC_QUERY.format(columns=_resolve_columns("full"))
+    client = get_bigquery_client()
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("country_code", "STRING", country_code),
+            bigquery.ScalarQueryParameter("start_date", "DATE", start_date),
+        ],
+    )
+    if not check_query_cost(client, query, job_config):
+        return
+
+    rate_limit("bigquery")
+    results = client.query(query, job_config=job_config).result()
+    yield from results.to_arrow_iterable(bqstorage_client=get_bqstorage_client())
@@ -1,11 +1,40 @@
 from datetime import datetime
 import os
+import threading
+import time
 import gspread
 import google.auth
 import requests
 from google.oauth2.service_account import Credentials
 from gspread.exceptions import APIError
-from config import GOOGLE_SHEET_ID, GOOGLE_SHEETS_SERVICE_ACCOUNT_FILE
+from config import (
+    GOOGLE_SHEET_ID,
+    GOOGLE_SHEET_POOL_IDS,
+    GOOGLE_SHEETS_SERVICE_ACCOUNT_FILE,
+    SHEETS_CELL_HEADROOM,
+    SHEETS_CELL_LIMIT,
+    SHEETS_FLUSH_ROWS,
+    SHEETS_FLUSH_SECONDS,
+    PLATFORM_RATE_LIMITS,
+    SHEETS_FULL_POLICY,
+    SHEETS_MIN_WRITES_PER_MINUTE,
+    SHEETS_SHARD_MAX_CELLS,
+    SHEETS_TRIM_MIN_ROWS,
+    SHEETS_WRITE_RETRIES,
+)
+from http_client import RETRYABLE_STATUS_CODES, backoff_seconds
+from result_rows import (
+    GOOGLE_HEADERS,
+    META_HEADERS,
+    TIKTOK_HEADERS,
+    google_rows,
+    meta_breakdown_columns,
+    meta_missing_value,
+    meta_rows,
+    tiktok_rows,
+)
+from search_terms import parse_search_term_rows
+from utils import RATE_LIMITERS, rate_limit
 
 SCOPES = [
     "https://www.googleapis.com/auth/spreadsheets",
@@ -20,6 +49,14 @@ else:
     creds, _ = google.auth.default(scopes=SCOPES)
     client = gspread.authorize(creds)
 RESULT_SHEET_TITLES = ["Results_Meta", "Results_TikTok", "Results_Google"]
+RESULT_INDEX_TITLE = "Results_Index"
+RESULT_INDEX_HEADERS = ["Timestamp", "Result Sheet", "Shard", "Worksheet", "Spreadsheet ID", "Spreadsheet URL"]
+# Column of the ID that identifies an ad within a search term's rows (column B) of each result sheet.
+RESULT_KEY_COLUMNS = {
+    "Results_Meta": META_HEADERS.index("Ad ID"),
+    "Results_TikTok": TIKTOK_HEADERS.index("Ad ID"),
+    "Results_Google": GOOGLE_HEADERS.index("Creative ID"),
+}
 
 
 def _runtime_principal_hint():
@@ -42,106 +79,704 @@ def _runtime_principal_hint():
     return "the attached Cloud Run runtime service account"
 
 
-def open_spreadsheet():
-    """Open the configured spreadsheet with a clearer permission error."""
+class SheetsWriteScheduler:
+    """Single path for Sheets write requests: per-minute budget, quota backoff and retries.
+
+    Every write waits for the "sheets" token bucket (SHEETS_WRITES_PER_MINUTE).
+    A 429 or 5xx APIError halves the bucket rate (down to
+    SHEETS_MIN_WRITES_PER_MINUTE) and is retried after a jittered backoff that
+    respects Retry-After; each success raises the rate again by 10% up to the
+    configured limit, so writes settle at the rate the quota sustains.
+    """
+
+    def __init__(self, retries=SHEETS_WRITE_RETRIES):
+        self.retries = max(0, int(retries))
+        self.max_rate = PLATFORM_RATE_LIMITS["sheets"]["rate"]
+        self.min_rate = min(self.max_rate, SHEETS_MIN_WRITES_PER_MINUTE / 60)
+
+    def _adjust_rate(self, factor):
+        limiter = RATE_LIMITERS["sheets"]
+        if self.max_rate <= 0:
+            return
+        limiter.set_rate(min(self.max_rate, max(self.min_rate, limiter.rate * factor)))
+
+    def call(self, write, *args, **kwargs):
+        """Run ``write(*args, **kwargs)`` within the write budget and return its result."""
+        for attempt in range(self.retries + 1):
+            rate_limit("sheets")
+            try:
+                result = write(*args, **kwargs)
+            except APIError as exc:
+                response = getattr(exc, "response", None)
+                status = getattr(response, "status_code", None)
+                if status not in RETRYABLE_STATUS_CODES or attempt >= self.retries:
+                    raise
+                self._adjust_rate(0.5)
+                delay = backoff_seconds(attempt, response)
+                print(
+                    f"[sheets] HTTP {status}, writing at {RATE_LIMITERS['sheets'].rate * 60:.0f}/min; "
+                    f"retrying in {delay:.1f}s ({attempt + 1}/{self.retries})..."
+                )
+                time.sleep(delay)
+            else:
+                if RATE_LIMITERS["sheets"].rate < self.max_rate:
+                    self._adjust_rate(1.1)
+                return result
+
+
+SHEETS_WRITES = SheetsWriteScheduler()
+
+
+def open_spreadsheet(sheet_id=None):
+    """Open the configured spreadsheet (or one from the pool) with a clearer permission error."""
+    sheet_id = sheet_id or GOOGLE_SHEET_ID
     try:
-        return client.open_by_key(GOOGLE_SHEET_ID)
+        return client.open_by_key(sheet_id)
     except PermissionError as exc:
         raise PermissionError(
-            f"Could not open GOOGLE_SHEET_ID ({GOOGLE_SHEET_ID}) in Google Sheets. "
+            f"Could not open spreadsheet {sheet_id} in Google Sheets. "
             f"Verify that {_runtime_principal_hint()} has access to the spreadsheet, "
-            "that the Google Sheets and Google Drive APIs are enabled, and that GOOGLE_SHEET_ID is correct."
+            "that the Google Sheets and Google Drive APIs are enabled, and that GOOGLE_SHEET_ID "
+            "and GOOGLE_SHEET_POOL_IDS are correct."
         ) from exc
 
 
-def _free_space_and_retry_append(sheet, rows):
-    """Append rows and recover from the 10M-cell workbook limit by trimming oldest data rows."""
+class WorkbookSession:
+    """Per-run cache of the spreadsheet, its worksheet handles and their header rows.
+
+    Opening the spreadsheet and looking up a worksheet are metadata reads, so a
+    run does them once per worksheet instead of once per term and platform.
+    Cached header rows are only replaced when a writer changes the schema.
+    Rollover shards in pool spreadsheets are registered here as well, so
+    worksheet titles map to the spreadsheet that holds them.
+    """
+
+    def __init__(self):
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._headers = {}
+        self._spreadsheets_by_title = {}
+        self._lock = threading.RLock()
+
+    @property
+    def spreadsheet(self):
+        with self._lock:
+            if self._spreadsheet is None:
+                self._spreadsheet = open_spreadsheet()
+            return self._spreadsheet
+
+    def worksheet(self, title, headers=None, rows=1000, cols=26):
+        """Return a cached worksheet handle.
+
+        With ``headers`` a missing worksheet is created and the header row is
+        written; without it WorksheetNotFound is raised like in gspread.
+        """
+        with self._lock:
+            sheet = self._worksheets.get(title)
+            if sheet is not None:
+                return sheet
+            try:
+                sheet = self.spreadsheet.worksheet(title)
+            except gspread.exceptions.WorksheetNotFound:
+                if headers is None:
+                    raise
+                sheet = SHEETS_WRITES.call(self.spreadsheet.add_worksheet, title=title, rows=str(rows), cols=str(cols))
+                _cell_budget(self.spreadsheet).record_sheet(title, rows, cols, data_rows=0)
+                # Write headers only if the sheet is newly created
+                _append_row(sheet, headers)
+                self._headers[title] = list(headers)
+            self._worksheets[title] = sheet
+            return sheet
+
+    def register(self, sheet, spreadsheet, headers):
+        """Cache a worksheet created outside ``worksheet()``, e.g. a rollover shard."""
+        with self._lock:
+            self._worksheets[sheet.title] = sheet
+            self._spreadsheets_by_title[sheet.title] = spreadsheet
+            self._headers[sheet.title] = list(headers)
+
+    def spreadsheet_for(self, title):
+        """Return the spreadsheet holding a worksheet; the configured spreadsheet unless registered."""
+        with self._lock:
+            return self._spreadsheets_by_title.get(title) or self.spreadsheet
+
+    def header(self, title):
+        """Return the header row of a worksheet, read from the sheet only on first use."""
+        with self._lock:
+            if title not in self._headers:
+                self._headers[title] = self.worksheet(title).row_values(1)
+            return list(self._headers[title])
+
+    def set_header(self, title, headers):
+        """Record a header row the caller has just written to the sheet."""
+        with self._lock:
+            self._headers[title] = list(headers)
+
+    def invalidate(self, title=None):
+        """Forget one worksheet (or everything) so the next access reads it again."""
+        with self._lock:
+            if title is None:
+                self._spreadsheet = None
+                self._worksheets.clear()
+                self._headers.clear()
+                self._spreadsheets_by_title.clear()
+            else:
+                self._worksheets.pop(title, None)
+                self._headers.pop(title, None)
+                self._spreadsheets_by_title.pop(title, None)
+
+
+WORKBOOK = WorkbookSession()
+
+
+def start_workbook_session():
+    """Drop cached handles from a previous run so sheets edited in between are read again."""
+    WORKBOOK.invalidate()
+    CELL_BUDGETS.clear()
+    RESULT_SHARDS.reset()
+    META_SCHEMA.reset()
+    WRITTEN_ADS.reset()
+
+
+class CellBudget:
+    """Local account of the workbook's grid cells against the Google Sheets cell limit.
+
+    Grid sizes are loaded from the spreadsheet metadata once per run and then
+    updated from the writes this module makes, so an append that would cross
+    the limit is planned before it is sent instead of failing and recovering.
+    Rows of sheets loaded from metadata count as used, which errs on the safe side.
+    """
+
+    def __init__(self, limit=SHEETS_CELL_LIMIT, headroom=SHEETS_CELL_HEADROOM):
+        self.limit = int(limit)
+        self.headroom = int(headroom)
+        self._sheets = None  # title -> {"rows": grid rows, "cols": grid columns, "data_rows": rows in use}
+        self._lock = threading.RLock()
+
+    def load(self, metadata):
+        """Take grid sizes from a ``fetch_sheet_metadata()`` response."""
+        with self._lock:
+            self._sheets = {}
+            for sheet in metadata["sheets"]:
+                grid = sheet["properties"].get("gridProperties", {})
+                rows, cols = grid.get("rowCount", 0), grid.get("columnCount", 0)
+                self._sheets[sheet["properties"]["title"]] = {"rows": rows, "cols": cols, "data_rows": rows}
+
+    def ensure_loaded(self, spreadsheet):
+        with self._lock:
+            if self._sheets is None:
+                self.load(spreadsheet.fetch_sheet_metadata())
+
+    def used(self):
+        with self._lock:
+            return sum(sheet["rows"] * sheet["cols"] for sheet in (self._sheets or {}).values())
+
+    def _grid_after_append(self, sheet, row_count, width):
+        return max(sheet["rows"], sheet["data_rows"] + row_count), max(sheet["cols"], width)
+
+    def cells_after_append(self, title, row_count, width):
+        """Grid cells of ``title`` once ``row_count`` rows of ``width`` columns are appended."""
+        with self._lock:
+            sheet = self._sheets.get(title, {"rows": 0, "cols": 0, "data_rows": 0})
+            rows, cols = self._grid_after_append(sheet, row_count, width)
+            return rows * cols
+
+    def plan_append(self, title, row_count, width):
+        """Return how many data rows of ``title`` must be trimmed before appending ``row_count`` rows."""
+        with self._lock:
+            sheet = self._sheets.get(title, {"rows": 0, "cols": 0, "data_rows": 0})
+            rows, cols = self._grid_after_append(sheet, row_count, width)
+            overflow = self.used() + rows * cols - sheet["rows"] * sheet["cols"] - (self.limit - self.headroom)
+            if overflow <= 0:
+                return 0
+            # Every trimmed row removes one full grid row of the sheet being written.
+            return -(-overflow // max(1, cols))
+
+    def deletable_rows(self, title):
+        """Data rows below the header that trimming may remove."""
+        with self._lock:
+            return max(0, self._sheets.get(title, {"data_rows": 0})["data_rows"] - 1)
+
+    def record_append(self, title, row_count, width):
+        with self._lock:
+            sheet = self._sheets.setdefault(title, {"rows": 0, "cols": 0, "data_rows": 0})
+            sheet["rows"], sheet["cols"] = self._grid_after_append(sheet, row_count, width)
+            sheet["data_rows"] += row_count
+
+    def record_trim(self, title, row_count):
+        with self._lock:
+            sheet = self._sheets[title]
+            sheet["rows"] -= row_count
+            sheet["data_rows"] -= row_count
+
+    def record_columns(self, title, cols):
+        with self._lock:
+            if self._sheets is not None and title in self._sheets:
+                self._sheets[title]["cols"] = max(self._sheets[title]["cols"], int(cols))
+
+    def record_sheet(self, title, rows, cols, data_rows):
+        """Record a sheet's new grid size after it was added, resized or cleared."""
+        with self._lock:
+            if self._sheets is not None:
+                self._sheets[title] = {"rows": int(rows), "cols": int(cols), "data_rows": int(data_rows)}
+
+    def has_sheet(self, title):
+        with self._lock:
+            return self._sheets is not None and title in self._sheets
+
+    def forget(self, title):
+        """Drop a deleted sheet from the account."""
+        with self._lock:
+            if self._sheets is not None:
+                self._sheets.pop(title, None)
+
+
+CELL_BUDGETS = {}  # spreadsheet id -> CellBudget
+_CELL_BUDGETS_LOCK = threading.Lock()
+
+
+def _cell_budget(spreadsheet, metadata=None):
+    """Return the cell budget of a spreadsheet, loading it from ``metadata`` or on first use."""
+    with _CELL_BUDGETS_LOCK:
+        budget = CELL_BUDGETS.get(spreadsheet.id)
+        if budget is None:
+            budget = CELL_BUDGETS[spreadsheet.id] = CellBudget()
+    if metadata is not None:
+        budget.load(metadata)
+    else:
+        budget.ensure_loaded(spreadsheet)
+    return budget
+
+
+def _trim_oldest_rows(sheet, rows_needed, budget):
+    """Delete the oldest data rows of a sheet (at least SHEETS_TRIM_MIN_ROWS) to stay below the cell limit."""
+    deletable_rows = budget.deletable_rows(sheet.title)
+    rows_to_delete = min(deletable_rows, max(rows_needed, SHEETS_TRIM_MIN_ROWS))
+    if rows_to_delete < rows_needed:
+        raise RuntimeError(
+            f"Google Sheet would exceed the {budget.limit} cell limit and '{sheet.title}' "
+            f"has only {deletable_rows} data rows that can be removed automatically."
+        )
+
+    SHEETS_WRITES.call(sheet.delete_rows, 2, rows_to_delete + 1)
+    budget.record_trim(sheet.title, rows_to_delete)
+    print(f"Workbook near its cell limit. Removed {rows_to_delete} oldest rows from '{sheet.title}' before appending.")
+
+
+def _append_rows(sheet, rows):
+    """Append rows, trimming the oldest data rows first when the cell budget says the append would not fit."""
     if not rows:
         return
 
+    width = max(len(row) for row in rows)
+    spreadsheet = WORKBOOK.spreadsheet_for(sheet.title)
+    budget = _cell_budget(spreadsheet)
+    rows_to_trim = budget.plan_append(sheet.title, len(rows), width)
+    if rows_to_trim:
+        _trim_oldest_rows(sheet, rows_to_trim, budget)
+
     try:
-        sheet.append_rows(rows, value_input_option="RAW")
-        return
+        SHEETS_WRITES.call(sheet.append_rows, rows, value_input_option="RAW")
     except APIError as exc:
-        message = str(exc)
-        if "above the limit of 10000000 cells" not in message:
+        if "above the limit of" not in str(exc):
             raise
-
-    # Remove enough old rows so re-append does not increase workbook size beyond the limit.
-    used_rows = len(sheet.get_all_values())
-    deletable_rows = max(0, used_rows - 1)  # keep header row
-    rows_to_delete = min(deletable_rows, max(len(rows) * 2, 1000))
-
-    if rows_to_delete <= 0:
-        raise RuntimeError(
-            "Google Sheet reached the 10M cell limit and no data rows can be removed automatically."
+        # The sheet was changed outside this run: re-read grid sizes and plan once more.
+        budget = _cell_budget(spreadsheet, spreadsheet.fetch_sheet_metadata())
+        _trim_oldest_rows(sheet, max(1, budget.plan_append(sheet.title, len(rows), width)), budget)
+        SHEETS_WRITES.call(sheet.append_rows, rows, value_input_option="RAW")
+    budget.record_append(sheet.title, len(rows), width)
+
+
+def _append_row(sheet, row):
+    """Single-row wrapper that goes through the same cell budget as batch appends."""
+    _append_rows(sheet, [row])
+
+
+class ResultShards:
+    """Current shard of each result sheet, rolling over instead of deleting old rows.
+
+    Shard 1 is the result sheet itself; shard n is "<title>_<n>", created in the
+    configured spreadsheet or, once that workbook is out of cells, in the next
+    spreadsheet of GOOGLE_SHEET_POOL_IDS. A shard also rolls over when it would
+    grow past SHEETS_SHARD_MAX_CELLS (0 = no per-shard limit). Every shard gets
+    a row in the Results_Index sheet. Old rows are only trimmed when
+    SHEETS_FULL_POLICY is "trim" or no spreadsheet has room left; once that
+    happens, later appends trim without trying to roll over again. Runs that
+    keep the result sheets ``resume`` from the shards listed in Results_Index.
+    """
+
+    def __init__(self):
+        self._shards = {}  # result sheet title -> (shard number, worksheet) of its current shard
+        self._pool = {}  # pool position -> opened spreadsheet
+        self._workbook = 0  # position of the spreadsheet new shards are created in
+        self._exhausted = False  # no spreadsheet had room for a new shard
+        self._lock = threading.RLock()
+
+    def reset(self):
+        with self._lock:
+            self._shards.clear()
+            self._pool.clear()
+            self._workbook = 0
+            self._exhausted = False
+
+    def workbook(self, position):
+        """Return the configured spreadsheet (position 0) or a spreadsheet from the pool."""
+        if position == 0:
+            return WORKBOOK.spreadsheet
+        with self._lock:
+            if position not in self._pool:
+                self._pool[position] = open_spreadsheet(GOOGLE_SHEET_POOL_IDS[position - 1])
+            return self._pool[position]
+
+    def resume(self):
+        """Continue each result sheet in the last shard Results_Index lists for it.
+
+        Used by runs that keep earlier results: rows go on where the last run
+        stopped and new shards are numbered after the existing ones.
+        """
+        latest = {}
+        for result_title, number, shard_title, spreadsheet_id in _shard_index_entries():
+            if number > latest.get(result_title, (0,))[0]:
+                latest[result_title] = (number, shard_title, spreadsheet_id)
+        workbook_ids = [GOOGLE_SHEET_ID] + GOOGLE_SHEET_POOL_IDS
+        with self._lock:
+            for result_title, (number, shard_title, spreadsheet_id) in latest.items():
+                if spreadsheet_id not in workbook_ids:
+                    print(f"Spreadsheet {spreadsheet_id} of '{shard_title}' is no longer configured; not resuming it.")
+                    continue
+                position = workbook_ids.index(spreadsheet_id)
+                spreadsheet = self.workbook(position)
+                try:
+                    shard = spreadsheet.worksheet(shard_title)
+                except gspread.exceptions.WorksheetNotFound:
+                    print(f"Shard '{shard_title}' listed in {RESULT_INDEX_TITLE} no longer exists; not resuming it.")
+                    continue
+                if shard_title != result_title:
+                    WORKBOOK.register(shard, spreadsheet, shard.row_values(1))
+                self._shards[result_title] = (number, shard)
+                self._workbook = max(self._workbook, position)
+
+    def current(self, sheet):
+        """Return the shard that rows for result sheet ``sheet`` go to."""
+        with self._lock:
+            if sheet.title not in self._shards:
+                self._shards[sheet.title] = (1, sheet)
+                _record_shard(sheet.title, 1, WORKBOOK.spreadsheet, sheet)
+            return self._shards[sheet.title][1]
+
+    def _needs_rollover(self, shard, row_count, width):
+        if SHEETS_FULL_POLICY != "rollover" or self._exhausted:
+            return False
+        budget = _cell_budget(WORKBOOK.spreadsheet_for(shard.title))
+        if budget.plan_append(shard.title, row_count, width):
+            return True
+        # A shard holding only its header row takes the rows even when they exceed the shard limit.
+        return (
+            SHEETS_SHARD_MAX_CELLS > 0
+            and budget.deletable_rows(shard.title) > 0
+            and budget.cells_after_append(shard.title, row_count, width) > SHEETS_SHARD_MAX_CELLS
         )
 
-    sheet.delete_rows(2, rows_to_delete + 1)
-    print(
-        f"Workbook near 10M-cell limit. Removed {rows_to_delete} oldest rows from '{sheet.title}' and retrying."
+    def _rollover(self, sheet, shard, row_count, width):
+        number = self._shards[sheet.title][0] + 1
+        headers = WORKBOOK.header(shard.title)
+        width = max(width, len(headers))
+        title = f"{sheet.title}_{number}"
+
+        while self._workbook <= len(GOOGLE_SHEET_POOL_IDS):
+            spreadsheet = self.workbook(self._workbook)
+            if not _cell_budget(spreadsheet).plan_append(title, row_count + 1, width):
+                break
+            self._workbook += 1
+        else:
+            print(f"No spreadsheet in GOOGLE_SHEET_POOL_IDS has room for '{title}'; trimming result sheets from now on.")
+            self._exhausted = True
+            return shard
+
+        # Skip titles taken by tabs this run does not know as shards, e.g. left over from an earlier run.
+        while any(budget.has_sheet(title) for budget in list(CELL_BUDGETS.values())):
+            number += 1
+            title = f"{sheet.title}_{number}"
+
+        # Sized for the header and the rows about to be written, so only those count against the shard limit.
+        grid_rows = row_count + 1
+        new_shard = SHEETS_WRITES.call(spreadsheet.add_worksheet, title=title, rows=str(grid_rows), cols=str(width))
+        _cell_budget(spreadsheet).record_sheet(title, grid_rows, width, data_rows=0)
+        WORKBOOK.register(new_shard, spreadsheet, headers)
+        _append_row(new_shard, headers)
+        self._shards[sheet.title] = (number, new_shard)
+        _record_shard(sheet.title, number, spreadsheet, new_shard)
+        print(f"'{shard.title}' is full. Continuing '{sheet.title}' in '{title}' of spreadsheet {spreadsheet.id}.")
+        return new_shard
+
+    def append(self, sheet, rows):
+        """Append rows for result sheet ``sheet`` to its current shard, rolling over first if needed."""
+        if not rows:
+            return
+        width = max(len(row) for row in rows)
+        with self._lock:
+            shard = self.current(sheet)
+            if self._needs_rollover(shard, len(rows), width):
+                shard = self._rollover(sheet, shard, len(rows), width)
+        _append_rows(shard, rows)
+
+
+RESULT_SHARDS = ResultShards()
+
+
+def _record_shard(result_title, number, spreadsheet, shard):
+    """Add a shard to the Results_Index sheet of the configured spreadsheet."""
+    index_sheet = WORKBOOK.worksheet(
+        RESULT_INDEX_TITLE, headers=RESULT_INDEX_HEADERS, rows=1, cols=len(RESULT_INDEX_HEADERS)
     )
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    _append_row(index_sheet, [timestamp, result_title, number, shard.title, spreadsheet.id, spreadsheet.url])
+
+
+class BufferedSheetWriter:
+    """Collect result rows per worksheet and append them in bounded batches.
+
+    Rows of all terms and threads for the same worksheet are merged into one
+    append call, which then goes through SHEETS_WRITES.
+
+    A worksheet is flushed once it has ``flush_rows`` pending rows or its
+    oldest pending row is ``flush_seconds`` old; each flush sends at most
+    ``flush_rows`` rows per append call. The age is only checked when rows
+    are added, there is no timer: rows of a worksheet that receives nothing
+    more wait for ``flush_all`` at the end of the run.
+
+    The buffer lock is only held while rows are added or taken out, so a
+    flush that waits for the write quota does not block other threads
+    buffering rows.
+    """
+
+    def __init__(self, flush_rows=SHEETS_FLUSH_ROWS, flush_seconds=SHEETS_FLUSH_SECONDS):
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_seconds = float(flush_seconds)
+        self._pending = {}  # worksheet id -> (worksheet, rows, time of the oldest pending row)
+        self._flush_hooks = {}  # worksheet title -> callable(sheet, rows) returning the rows to append
+        self._flush_locks = {}  # worksheet id -> lock held while that worksheet's rows are sent
+        self._lock = threading.Lock()
+
+    def set_flush_hook(self, title, hook):
+        """Run ``hook(sheet, rows)`` before rows of a worksheet are appended, e.g. to sync its header."""
+        with self._lock:
+            self._flush_hooks[title] = hook
+
+    def append(self, sheet, rows):
+        if not rows:
+            return
+        with self._lock:
+            _, pending_rows, first_pending_at = self._pending.get(sheet.id, (sheet, [], time.monotonic()))
+            pending_rows.extend(rows)
+            self._pending[sheet.id] = (sheet, pending_rows, first_pending_at)
+            due = (
+                len(pending_rows) >= self.flush_rows
+                or time.monotonic() - first_pending_at >= self.flush_seconds
+            )
+        if due:
+            self.flush(sheet)
 
-    # Retry once after cleanup.
-    sheet.append_rows(rows, value_input_option="RAW")
+    def flush(self, sheet):
+        with self._lock:
+            _, rows, _ = self._pending.pop(sheet.id, (sheet, [], None))
+            hook = self._flush_hooks.get(sheet.title)
+            flush_lock = self._flush_locks.setdefault(sheet.id, threading.Lock())
+        if not rows:
+            return
+        # One flush per worksheet at a time, so header updates and shard rollovers
+        # are planned against the worksheet's current state.
+        with flush_lock:
+            if hook is not None:
+                rows = hook(RESULT_SHARDS.current(sheet), rows)
+            for start in range(0, len(rows), self.flush_rows):
+                RESULT_SHARDS.append(sheet, rows[start:start + self.flush_rows])
 
+    def flush_all(self):
+        with self._lock:
+            sheets = [sheet for sheet, _, _ in self._pending.values()]
+        for sheet in sheets:
+            self.flush(sheet)
 
-def _free_space_and_append_row(sheet, row):
-    """Single-row wrapper that reuses the same limit-handling logic as batch appends."""
-    _free_space_and_retry_append(sheet, [row])
 
+SHEET_WRITER = BufferedSheetWriter()
 
-def clear_results_sheets():
-    """Clear result worksheets before a run while keeping header rows."""
-    spreadsheet = open_spreadsheet()
 
-    for sheet_title in RESULT_SHEET_TITLES:
-        try:
-            sheet = spreadsheet.worksheet(sheet_title)
-        except gspread.exceptions.WorksheetNotFound:
-            # print(f"Skipping clear: worksheet '{sheet_title}' does not exist yet.")
+def flush_sheet_writes():
+    """Write all rows that are still buffered for the result worksheets."""
+    SHEET_WRITER.flush_all()
+
+
+def _shard_index_entries():
+    """Return ``(result sheet, shard number, worksheet, spreadsheet id)`` for every shard in Results_Index."""
+    try:
+        index_sheet = WORKBOOK.worksheet(RESULT_INDEX_TITLE)
+    except gspread.exceptions.WorksheetNotFound:
+        return []
+    entries = []
+    for row in index_sheet.get_all_values()[1:]:
+        row = row + [""] * (len(RESULT_INDEX_HEADERS) - len(row))
+        _, result_title, number, shard_title, spreadsheet_id, _ = row[:len(RESULT_INDEX_HEADERS)]
+        if result_title in RESULT_SHEET_TITLES and shard_title and str(number).isdigit():
+            entries.append((result_title, int(number), shard_title, spreadsheet_id))
+    return entries
+
+
+def _indexed_shards():
+    """Return ``{spreadsheet id: worksheet titles}`` of the rollover shards listed in Results_Index."""
+    shards = {}
+    for result_title, _, shard_title, spreadsheet_id in _shard_index_entries():
+        # Shard 1 is the result sheet itself and is only cleared.
+        if shard_title != result_title:
+            shards.setdefault(spreadsheet_id, set()).add(shard_title)
+    return shards
+
+
+def _clear_result_sheets_in(spreadsheet, shard_titles):
+    """Clear the result and index sheets of one spreadsheet and delete the given rollover shards of the last run."""
+    metadata = spreadsheet.fetch_sheet_metadata()
+    budget = _cell_budget(spreadsheet, metadata)
+
+    requests_body = []
+    cleared_titles = []
+    for sheet in metadata["sheets"]:
+        properties = sheet["properties"]
+        sheet_title = properties["title"]
+        sheet_id = properties["sheetId"]
+        if sheet_title in shard_titles:
+            requests_body.append({"deleteSheet": {"sheetId": sheet_id}})
+            cleared_titles.append(sheet_title)
+            budget.forget(sheet_title)
+            continue
+        if sheet_title not in RESULT_SHEET_TITLES + [RESULT_INDEX_TITLE]:
             continue
 
-        values = sheet.get_all_values()
-        if len(values) <= 1:
-            # print(f"Worksheet '{sheet_title}' already empty (header only).")
+        row_count = properties["gridProperties"]["rowCount"]
+        if row_count <= 1:
             continue
+        if row_count > 2:
+            requests_body.append({
+                "deleteDimension": {
+                    "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": 2, "endIndex": row_count}
+                }
+            })
+        requests_body.append({
+            "updateCells": {
+                "range": {"sheetId": sheet_id, "startRowIndex": 1, "endRowIndex": 2},
+                "fields": "userEnteredValue",
+            }
+        })
+        cleared_titles.append(sheet_title)
+        # Header row plus the emptied row 2 remain.
+        budget.record_sheet(sheet_title, 2, properties["gridProperties"]["columnCount"], data_rows=1)
+
+    if not requests_body:
+        return
+
+    SHEETS_WRITES.call(spreadsheet.batch_update, {"requests": requests_body})
+    # Cached handles still carry the old grid size.
+    for sheet_title in cleared_titles:
+        WORKBOOK.invalidate(sheet_title)
+
+
+def clear_results_sheets():
+    """Clear result worksheets before a run while keeping header rows.
+
+    Row counts come from the spreadsheet metadata instead of downloading the
+    sheet values, and each spreadsheet is cleared in one batchUpdate: rows
+    3..n are deleted and row 2 is emptied, which also works when the header
+    row is frozen (a sheet cannot lose all of its non-frozen rows). Rollover
+    shards that the previous run listed in Results_Index are deleted, also in
+    the pool spreadsheets; other tabs are left alone whatever their name.
+    """
+    shards = _indexed_shards()
+    for position in range(len(GOOGLE_SHEET_POOL_IDS) + 1):
+        spreadsheet = RESULT_SHARDS.workbook(position)
+        _clear_result_sheets_in(spreadsheet, shards.get(spreadsheet.id, set()))
+
+
+class WrittenAds:
+    """(search term, ad ID) of the rows already in the result sheets, for runs that keep them.
+
+    Sheets rows can only be appended, so a run that keeps earlier results skips
+    ads already written for the same term instead of adding them again. ``load``
+    reads the term and ID columns of every shard once; until then (and in full
+    runs) nothing is skipped.
+    """
+
+    def __init__(self):
+        self._keys = None  # result sheet title -> set of (term, ad ID); None while not deduplicating
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._keys = None
+
+    def load(self):
+        """Read the keys of the result sheets and the shards listed in Results_Index."""
+        shards = {(title, GOOGLE_SHEET_ID, title) for title in RESULT_SHEET_TITLES}
+        shards.update(
+            (result_title, spreadsheet_id, shard_title)
+            for result_title, _, shard_title, spreadsheet_id in _shard_index_entries()
+        )
+        workbook_ids = [GOOGLE_SHEET_ID] + GOOGLE_SHEET_POOL_IDS
+        keys = {title: set() for title in RESULT_SHEET_TITLES}
+        for result_title, spreadsheet_id, shard_title in sorted(shards):
+            if spreadsheet_id not in workbook_ids:
+                continue
+            try:
+                shard = RESULT_SHARDS.workbook(workbook_ids.index(spreadsheet_id)).worksheet(shard_title)
+            except gspread.exceptions.WorksheetNotFound:
+                continue
+            key_column = gspread.utils.rowcol_to_a1(1, RESULT_KEY_COLUMNS[result_title] + 1)[:-1]
+            terms, ids = shard.batch_get(["B2:B", f"{key_column}2:{key_column}"])
+            keys[result_title].update(
+                (term[0] if term else "", ad_id[0] if ad_id else "") for term, ad_id in zip(terms, ids)
+            )
+        with self._lock:
+            self._keys = keys
+
+    def unwritten(self, title, items, row=lambda item: item):
+        """Return the items whose row (``row(item)``) has a term and ad ID not written yet, and remember them."""
+        column = RESULT_KEY_COLUMNS[title]
+        with self._lock:
+            if self._keys is None:
+                return items
+            keys = self._keys[title]
+            fresh = []
+            for item in items:
+                values = row(item)
+                key = (str(values[1]), str(values[column]))
+                if key not in keys:
+                    keys.add(key)
+                    fresh.append(item)
+            return fresh
+
+
+WRITTEN_ADS = WrittenAds()
+
+
+def resume_result_shards():
+    """Keep writing to the shards of the previous run instead of starting again at shard 1.
+
+    Ads already in the result sheets are not written again for the same term.
+    """
+    RESULT_SHARDS.resume()
+    WRITTEN_ADS.load()
 
-        sheet.delete_rows(2, len(values))
-        # print(f"Cleared {len(values) - 1} rows from worksheet '{sheet_title}'.")
 
 def read_search_terms():
     """Read search terms and associated metadata from the Google Sheet."""
     # Open the sheet named "Search_Terms"
-    sheet = open_spreadsheet().worksheet("Search terms")
+    sheet = WORKBOOK.worksheet("Search terms")
 
     # Fetch all rows from the sheet
     rows = sheet.get_all_values()
 
-    # Skip the header row and process the data
-    search_terms = []
-    for row in rows[1:]:  # Skip the header row
-        term = row[0]  # Column A: Search term
-        date_from = row[1] if len(row) > 1 else None  # Column B: Date from (yyyy-mm-dd)
-        date_to = row[2] if len(row) > 2 else None  # Column C: Date to (yyyy-mm-dd)
-        fetch_meta = row[3].strip().lower() == "x" if len(row) > 3 else False  # Column D: Meta flag
-        fetch_tiktok = row[4].strip().lower() == "x" if len(row) > 4 else False  # Column E: TikTok flag
-        fetch_google = row[5].strip().lower() == "x" if len(row) > 5 else False  # Column F: Google flag
-
-        # Append the processed data as a dictionary
-        search_terms.append({
-            "term": term,
-            "date_from": date_from,
-            "date_to": date_to,
-            "fetch_meta": fetch_meta,
-            "fetch_tiktok": fetch_tiktok,
-            "fetch_google": fetch_google
-        })
-
-    return search_terms
+    return parse_search_term_rows(rows)
 
 def update_sheet(results):
-    sheet = open_spreadsheet().sheet1
+    sheet = WORKBOOK.spreadsheet.sheet1
     for i, result in enumerate(results, start=2):
         sheet.update_cell(i, 2, str(result))  # Write results in column B
 
@@ -152,67 +787,63 @@ def write_tiktok_results_to_sheet(results, search_term):
         return
 
     """Write TikTok ad results to a Google Sheet."""
-    spreadsheet = open_spreadsheet()
+    # Get the "Results_TikTok" sheet, creating it with headers if it does not exist
+    sheet = WORKBOOK.worksheet("Results_TikTok", headers=TIKTOK_HEADERS)
 
-    # Check if the "Results_TikTok" sheet exists, create it if not
-    try:
-        sheet = spreadsheet.worksheet("Results_TikTok")
-    except gspread.exceptions.WorksheetNotFound:
-        sheet = spreadsheet.add_worksheet(title="Results_TikTok", rows="1000", cols="26")
-        # Write headers only if the sheet is newly created
-        headers = [
-            "Timestamp", "Search Term", "Ad ID", "Business Name", "Paid For By", "First Shown Date", "Last Shown Date",
-            "Status", "Status Statement", "Reach (Unique Users)", "Reach by Country",
-            "Targeted Countries", "Targeted Interests", "Targeted Gender", "Targeted Age",
-            "Number of Users Targeted", "Video URL", "Video Cover Image URL", "Image URL"
-        ]
-        _free_space_and_append_row(sheet, headers)
-
-    # Write each result to the sheet
+    # Collect all rows and hand them to the buffered writer
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    for result in results:
-        data = result.get("data", {})
-        advertiser = data.get("advertiser", {})
-        ad = data.get("ad", {})
-        ad_group = data.get("ad_group", {})
-        targeting_info = ad_group.get("targeting_info", {})
-        reach = ad.get("reach", {})
-
-        # Extract targeting details
-        targeted_gender = ", ".join(
-            [gender for gender, targeted in targeting_info.get("gender", {}).items() if targeted]
-        )
-        targeted_age = ", ".join(
-            [age for age, targeted in targeting_info.get("age", {}).items() if targeted]
-        )
+    rows = WRITTEN_ADS.unwritten(sheet.title, tiktok_rows(results, search_term, timestamp))
+    SHEET_WRITER.append(sheet, rows)
 
-        # Convert "Reach by Country" dictionary to a string
-        reach_by_country = ", ".join(
-            [f"{country}: {count}" for country, count in reach.get("unique_users_seen_by_country", {}).items()]
-        )
 
-        row = [
-            timestamp,  # Timestamp
-            search_term,  # Search Term
-            ad.get("id", ""),
-            advertiser.get("business_name", ""),
-            advertiser.get("paid_for_by", ""),
-            ad.get("first_shown_date", ""),
-            ad.get("last_shown_date", ""),
-            ad.get("status", ""),
-            ad.get("status_statement", ""),
-            reach.get("unique_users_seen", ""),
-            reach_by_country,  # Converted dictionary to string
-            ", ".join(targeting_info.get("country", [])),
-            targeting_info.get("interest", ""),
-            targeted_gender,
-            targeted_age,
-            targeting_info.get("number_of_users_targeted", ""),
-            ad.get("videos", [{}])[0].get("url", "") if ad.get("videos") else "",
-            ad.get("videos", [{}])[0].get("cover_image_url", "") if ad.get("videos") else "",
-            ad.get("image_urls", [])[0] if ad.get("image_urls") else "",
-        ]
-        _free_space_and_append_row(sheet, row)
+class MetaHeaderSchema:
+    """Run-wide Results_Meta header: the sheet's header plus every reach breakdown column seen so far.
+
+    Writers extend the schema and build rows against it. New columns are only
+    ever appended, so a row built earlier is a prefix of the final schema; it is
+    padded at flush time with the value ``meta_rows`` would have put there, and
+    the header row is rewritten in place (one range write) only when the schema
+    has grown since it was last written.
+    """
+
+    TITLE = "Results_Meta"
+
+    def __init__(self):
+        self._headers = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._headers = None
+
+    def extend(self, columns):
+        """Add new dynamic columns in sorted order and return the current header."""
+        with self._lock:
+            if self._headers is None:
+                self._headers = WORKBOOK.header(self.TITLE)
+            known = set(self._headers)
+            self._headers.extend(sorted({column for column in columns if column not in known}))
+            return list(self._headers)
+
+    def prepare_flush(self, sheet, rows):
+        """Write the grown header row to the current shard and pad buffered rows to its width.
+
+        ``rows`` are the buffered ``(row, missing value)`` pairs of ``write_meta_results_to_sheet``.
+        """
+        with self._lock:
+            headers = list(self._headers) if self._headers is not None else WORKBOOK.header(self.TITLE)
+        if len(headers) > len(WORKBOOK.header(sheet.title)):
+            if sheet.col_count < len(headers):
+                SHEETS_WRITES.call(sheet.add_cols, len(headers) - sheet.col_count)
+                _cell_budget(WORKBOOK.spreadsheet_for(sheet.title)).record_columns(sheet.title, len(headers))
+            SHEETS_WRITES.call(sheet.update, values=[headers], range_name="A1", value_input_option="RAW")
+            WORKBOOK.set_header(sheet.title, headers)
+        return [row + [missing] * (len(headers) - len(row)) for row, missing in rows]
+
+
+META_SCHEMA = MetaHeaderSchema()
+SHEET_WRITER.set_flush_hook(MetaHeaderSchema.TITLE, META_SCHEMA.prepare_flush)
+
 
 def write_meta_results_to_sheet(results, search_term):
     # Check if results is None or empty
@@ -225,204 +856,37 @@ def write_meta_results_to_sheet(results, search_term):
         print(f"Meta API error for search term '{search_term}': {results.get('message')} (Code: {results.get('code')})")
         return
     
-    """Write Meta ad results to a Google Sheet with batching to avoid quota limits."""
-    # Open the sheet named "Results_Meta"
-    spreadsheet = open_spreadsheet()
+    """Write Meta ad results to a Google Sheet with batching to avoid quota limits.
 
-    # Check if the "Results_Meta" sheet exists, create it if not
-    try:
-        sheet = spreadsheet.worksheet("Results_Meta")
-    except gspread.exceptions.WorksheetNotFound:
-        sheet = spreadsheet.add_worksheet(title="Results_Meta", rows="1000", cols="50")
-        # Write headers only if the sheet is newly created
-        headers = [
-            "Timestamp", "Search Term", "Ad ID", "Ad Creation Time", "Ad Creative Bodies",
-            "Ad Creative Link Captions", "Ad Creative Link Descriptions", "Ad Creative Link Titles",
-            "Ad Delivery Start Time", "Ad Delivery Stop Time", "Ad Snapshot URL", "Currency",
-            "Delivery by Region", "Demographic Distribution", "Estimated Audience Size",
-            "EU Total Reach", "Impressions", "Page ID", "Page Name", "Publisher Platforms", "Beneficiary Payers",
-            "Spend", "Target Ages", "Target Gender", "Target Locations"
-        ]
-        _free_space_and_append_row(sheet, headers)
+    Values are placed by header name, so results fetched with a reduced field
+    profile leave the columns of fields that were not requested empty.
+    """
+    # Get the "Results_Meta" sheet, creating it with headers if it does not exist
+    sheet = WORKBOOK.worksheet("Results_Meta", headers=META_HEADERS, cols=50)
 
-    # Prepare rows for batch writing
-    rows = []
+    # Build rows against the run-wide header schema, extended by the reach columns of these results
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    headers = META_SCHEMA.extend(meta_breakdown_columns(results))
+    _, rows = meta_rows(results, search_term, timestamp, headers)
 
-    # Collect all unique age_range and gender combinations for dynamic columns
-    dynamic_columns = set()
-    for result in results:
-        for breakdown in result.get("age_country_gender_reach_breakdown", []):
-            country = breakdown.get("country", "")
-            if country == "AT": # Remove or adapt to see non-AT countries
-                for age_gender in breakdown.get("age_gender_breakdowns", []):
-                    age_range = age_gender.get("age_range", "")
-                    dynamic_columns.add(f"{country} - {age_range} - Male")
-                    dynamic_columns.add(f"{country} - {age_range} - Female")
-                    dynamic_columns.add(f"{country} - {age_range} - Unknown")
-
-    # Sort dynamic columns for consistent order
-    dynamic_columns = sorted(dynamic_columns)
-
-    # Add dynamic columns to the sheet headers if they don't already exist
-    existing_headers = sheet.row_values(1)
-    new_headers = existing_headers + [col for col in dynamic_columns if col not in existing_headers]
-    if len(new_headers) > len(existing_headers):
-        sheet.delete_rows(1)  # Remove the old header row
-        sheet.insert_row(new_headers, index=1)  # Insert the updated header row
-
-    for result in results:
-        # Extract fields from the result
-        ad_id = result.get("id", "")
-        ad_creation_time = result.get("ad_creation_time", "")
-
-        # Usually Meta returns lists for these fields, but we only need the first entry
-        ad_creative_bodies = result.get("ad_creative_bodies", [None])[0]  # Use the first entry or None if the list is empty
-        ad_creative_link_captions = result.get("ad_creative_link_captions", [None])[0]  # Use the first entry or None
-        ad_creative_link_descriptions = result.get("ad_creative_link_descriptions", [None])[0]  # Use the first entry or None
-        ad_creative_link_titles = result.get("ad_creative_link_titles", [None])[0]  # Use the first entry or None
-        # If you want to join all entries, uncomment the following lines:
-        # ad_creative_bodies = "\n".join(result.get("ad_creative_bodies", []))
-        # ad_creative_link_captions = "\n".join(result.get("ad_creative_link_captions", []))
-        # ad_creative_link_descriptions = "\n".join(result.get("ad_creative_link_descriptions", []))
-        # ad_creative_link_titles = "\n".join(result.get("ad_creative_link_titles", []))
-
-        ad_delivery_start_time = result.get("ad_delivery_start_time", "")
-        ad_delivery_stop_time = result.get("ad_delivery_stop_time", "")
-        ad_snapshot_url = result.get("ad_snapshot_url", "")
-        currency = result.get("currency", "")
-        delivery_by_region = "\n".join(
-            [f"{region.get('region', '')}: {region.get('percentage', '')}" for region in result.get("delivery_by_region", [])]
-        )
-        demographic_distribution = "\n".join(
-            [f"Age: {demo.get('age', '')}, Gender: {demo.get('gender', '')}, Percentage: {demo.get('percentage', '')}" for demo in result.get("demographic_distribution", [])]
-        )
-        estimated_audience_size = result.get("estimated_audience_size", {})
-        estimated_audience_size_str = f"{estimated_audience_size.get('lower_bound', '')} - {estimated_audience_size.get('upper_bound', '')}"
-        impressions = result.get("impressions", {})
-        impressions_str = f"{impressions.get('lower_bound', '')} - {impressions.get('upper_bound', '')}"
-        eu_total_reach = result.get("eu_total_reach", "")
-        page_id = result.get("page_id", "")
-        page_name = result.get("page_name", "")
-        publisher_platforms = ", ".join(result.get("publisher_platforms", []))
-        beneficiary_payers = ", ".join([f"{payer.get('payer', '')}" for payer in result.get("beneficiary_payers", [])])
-        spend = result.get("spend", {})
-        spend_str = f"{spend.get('lower_bound', '')} - {spend.get('upper_bound', '')}"
-        target_ages = "-".join(result.get("target_ages", []))
-        target_gender = result.get("target_gender", "")
-        target_locations = "\n".join(
-            [f"{loc.get('name', '')} (Excluded: {loc.get('excluded', False)})" for loc in result.get("target_locations", [])]
-        )
-
-        # Prepare the base row
-        row = [
-            timestamp, search_term, ad_id, ad_creation_time, ad_creative_bodies,
-            ad_creative_link_captions, ad_creative_link_descriptions, ad_creative_link_titles,
-            ad_delivery_start_time, ad_delivery_stop_time, ad_snapshot_url, currency,
-            delivery_by_region, demographic_distribution, estimated_audience_size_str,
-            eu_total_reach, impressions_str, page_id, page_name, publisher_platforms, beneficiary_payers,
-            spend_str, target_ages, target_gender, target_locations
-        ]
-
-        # Add dynamic columns for age_range and gender combinations
-        dynamic_values = {col: 0 for col in dynamic_columns}
-        for breakdown in result.get("age_country_gender_reach_breakdown", []):
-            country = breakdown.get("country", "")
-            if country == "AT": # Remove or adapt to see non-AT countries
-                for age_gender in breakdown.get("age_gender_breakdowns", []):
-                    age_range = age_gender.get("age_range", "")
-                    male = age_gender.get("male", 0)
-                    female = age_gender.get("female", 0)
-                    unknown = age_gender.get("unknown", 0)
-                    dynamic_values[f"{country} - {age_range} - Male"] += male
-                    dynamic_values[f"{country} - {age_range} - Female"] += female
-                    dynamic_values[f"{country} - {age_range} - Unknown"] += unknown
-
-        # Append dynamic values to the row
-        row.extend([dynamic_values[col] for col in dynamic_columns])
-        rows.append(row)
+    # Batch write rows to the sheet; each row keeps the value for breakdown columns added before the flush
+    pending = [(row, meta_missing_value(result)) for row, result in zip(rows, results)]
+    SHEET_WRITER.append(sheet, WRITTEN_ADS.unwritten(sheet.title, pending, row=lambda item: item[0]))
 
-    # Batch write rows to the sheet
-    _free_space_and_retry_append(sheet, rows)
 
 def write_google_results_to_sheet(results, search_term):
     # Check if results is None or empty
-    if not results:
+    if results is None or len(results) == 0:
         print(f"No results to write for search term '{search_term}'.")
         return
     
     """Write Google Ads Transparency Center results to a Google Sheet."""
-    spreadsheet = open_spreadsheet()
-
-    # Check if the "Results_Google" sheet exists, create it if not
-    try:
-        sheet = spreadsheet.worksheet("Results_Google")
-    except gspread.exceptions.WorksheetNotFound:
-        sheet = spreadsheet.add_worksheet(title="Results_Google", rows="1000", cols="26")
-        # Write headers only if the sheet is newly created
-        headers = [
-            "Timestamp", "Search Term", "Advertiser ID", "Creative ID", "Creative Page URL",
-            "Ad Format Type", "Advertiser Disclosed Name", "Advertiser Legal Name",
-            "Advertiser Location", "Advertiser Verification Status", "Region Code",
-            "First Shown", "Last Shown", "Times Shown Start Date", "Times Shown End Date",
-            "Times Shown Lower Bound", "Times Shown Upper Bound", "Demographic Info",
-            "Geo Location", "Contextual Signals", "Customer Lists", "Topics of Interest"
-        ]
-        _free_space_and_append_row(sheet, headers)
+    # Get the "Results_Google" sheet, creating it with headers if it does not exist
+    sheet = WORKBOOK.worksheet("Results_Google", headers=GOOGLE_HEADERS)
 
     # Prepare rows for batch writing
-    rows = []
-    results_rows = [dict(row) for row in results]
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    for result in results_rows:
-        # Extract fields using integer indices
-        advertiser_id = result.get('advertiser_id')
-        creative_id = result.get('creative_id')
-        creative_page_url = result.get('creative_page_url')
-        ad_format_type = result.get('ad_format_type')
-        advertiser_disclosed_name = result.get('advertiser_disclosed_name')
-        advertiser_legal_name = result.get('advertiser_legal_name')
-        advertiser_location = result.get('advertiser_location')
-        advertiser_verification_status = result.get('advertiser_verification_status')
-        region_code = result.get('region_code')
-        first_shown = result.get('first_shown')
-        last_shown = result.get('last_shown')
-        times_shown_start_date = result.get('times_shown_start_date')
-        times_shown_end_date = result.get('times_shown_end_date')
-        times_shown_lower_bound = result.get('times_shown_lower_bound')
-        times_shown_upper_bound = result.get('times_shown_upper_bound')
-        demographic_info = result.get('demographic_info')
-        geo_location = result.get('geo_location')
-        contextual_signals = result.get('contextual_signals')
-        customer_lists = result.get('customer_lists')
-        topics_of_interest = result.get('topics_of_interest')
-
-        # Prepare the row
-        row = [
-            timestamp,  # Timestamp
-            search_term,  # Search Term
-            advertiser_id,
-            creative_id,
-            creative_page_url,
-            ad_format_type,
-            advertiser_disclosed_name,
-            advertiser_legal_name,
-            advertiser_location,
-            advertiser_verification_status,
-            region_code,
-            first_shown,
-            last_shown,
-            times_shown_start_date,
-            times_shown_end_date,
-            times_shown_lower_bound,
-            times_shown_upper_bound,
-            demographic_info,
-            geo_location,
-            contextual_signals,
-            customer_lists,
-            topics_of_interest
-        ]
-        rows.append(row)
+    rows = WRITTEN_ADS.unwritten(sheet.title, google_rows(results, search_term, timestamp))
 
     # Batch write rows to the sheet
-    _free_space_and_retry_append(sheet, rows)
\ No newline at end of file
+    SHEET_WRITER.append(sheet, rows)
@@ -0,0 +1,158 @@
+"""Local DuckDB snapshot of the Ads Transparency Center creative_stats table.
+
+Sync one region (optionally limited to a date window) from BigQuery once, then
+answer term lookups locally without BigQuery latency or cost:
+
+    python src/google_snapshot.py sync --region AT --since 2024-01-01
+
+Later syncs only fetch rows whose last_shown is on or after the newest
+last_shown already stored for the region.
+"""
+import argparse
+import os
+import threading
+
+from config import GOOGLE_SNAPSHOT_PATH
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+SNAPSHOT_TABLE = "creative_stats_snapshot"
+_SNAPSHOT_LOCK = threading.Lock()
+
+# Same filter, ordering and per-term limit as the BigQuery queries in google_ads.
+SNAPSHOT_QUERY = f"""
+SELECT {{columns}}
+FROM {SNAPSHOT_TABLE}
+WHERE
+    (
+        LOWER(advertiser_disclosed_name) LIKE '%' || LOWER($term) || '%' OR
+        LOWER(advertiser_legal_name) LIKE '%' || LOWER($term) || '%'
+    )
+    AND region_code = $country_code
+    AND CAST(first_shown AS DATE) >= CAST($min_date AS DATE)
+    AND CAST(last_shown AS DATE) <= CAST($max_date AS DATE)
+ORDER BY last_shown DESC, creative_id
+LIMIT $max_results
+"""
+
+
+def _connect(path=None, read_only=False):
+    if duckdb is None:
+        raise RuntimeError("The local Google snapshot needs the 'duckdb' package. Install it with 'pip install duckdb'.")
+    path = path or GOOGLE_SNAPSHOT_PATH
+    if read_only and not os.path.exists(path):
+        raise FileNotFoundError(
+            f"No local Google snapshot at '{path}'. Run 'python src/google_snapshot.py sync --region <CODE>' first."
+        )
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return duckdb.connect(path, read_only=read_only)
+
+
+def _table_exists(connection):
+    return bool(connection.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [SNAPSHOT_TABLE]
+    ).fetchone()[0])
+
+
+def get_watermark(region, path=None):
+    """Return the newest last_shown date stored for a region, or None for an empty snapshot."""
+    if not os.path.exists(path or GOOGLE_SNAPSHOT_PATH):
+        return None
+    with _SNAPSHOT_LOCK, _connect(path, read_only=True) as connection:
+        if not _table_exists(connection):
+            return None
+        return connection.execute(
+            f"SELECT CAST(MAX(last_shown) AS DATE) FROM {SNAPSHOT_TABLE} WHERE region_code = ?", [region]
+        ).fetchone()[0]
+
+
+def load_record_batches(record_batches, path=None):
+    """Upsert Arrow record batches into the snapshot, keyed by (creative_id, region_code).
+
+    Returns the number of rows loaded.
+    """
+    loaded = 0
+    with _SNAPSHOT_LOCK, _connect(path) as connection:
+        for batch in record_batches:
+            if batch.num_rows == 0:
+                continue
+            connection.register("incoming", batch)
+            if not _table_exists(connection):
+                connection.execute(f"CREATE TABLE {SNAPSHOT_TABLE} AS SELECT * FROM incoming WHERE false")
+            connection.execute(
+                f"""
+                DELETE FROM {SNAPSHOT_TABLE}
+                WHERE (creative_id, region_code) IN (SELECT (creative_id, region_code) FROM incoming)
+                """
+            )
+            connection.execute(f"INSERT INTO {SNAPSHOT_TABLE} BY NAME SELECT * FROM incoming")
+            connection.unregister("incoming")
+            loaded += batch.num_rows
+    return loaded
+
+
+def sync_snapshot(region, since=None, path=None):
+    """Pull new and updated creative_stats rows for one region from BigQuery into the snapshot.
+
+    ``since`` (yyyy-mm-dd) limits the first sync to ads shown on or after that
+    date; later syncs continue from the stored last_shown watermark.
+    """
+    # Imported here so local lookups work without the BigQuery client libraries.
+    from google_ads import sync_region_record_batches
+
+    watermark = get_watermark(region, path)
+    start_date = str(watermark) if watermark else since
+    print(f"Syncing Google Ads Transparency data for region '{region}' (last_shown >= {start_date or 'beginning'})...")
+    loaded = load_record_batches(sync_region_record_batches(region, start_date), path)
+    print(f"Loaded {loaded} rows into the local Google snapshot at '{path or GOOGLE_SNAPSHOT_PATH}'.")
+    return loaded
+
+
+def _select_list(column_names):
+    return ",\n    ".join(column_names)
+
+
+def query_snapshot(term, min_date, max_date, max_results=500, country_code=None, column_names=None, path=None):
+    """Run a term lookup against the local snapshot and return row dicts, newest first."""
+    with _SNAPSHOT_LOCK, _connect(path, read_only=True) as connection:
+        cursor = connection.execute(
+            SNAPSHOT_QUERY.format(columns=_select_list(column_names or ["*"])),
+            {
+                "term": term,
+                "country_code": country_code or "AT",
+                "min_date": str(min_date),
+                "max_date": str(max_date),
+                "max_results": int(max_results) if max_results else 500,
+            },
+        )
+        names = [description[0] for description in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def query_snapshot_batch(searches, max_results=500, country_code=None, column_names=None, path=None):
+    """Run ``query_snapshot`` for many ``(term, min_date, max_date)`` searches, tagging rows with the term."""
+    results = []
+    for term, min_date, max_date in searches:
+        rows = query_snapshot(term, min_date, max_date, max_results, country_code, column_names, path)
+        for row in rows:
+            row["search_term"] = term
+        results.append(rows)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local Google Ads Transparency snapshot.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    sync_parser = subcommands.add_parser("sync", help="Pull new rows for one region from BigQuery.")
+    sync_parser.add_argument("--region", required=True, help="Region code, e.g. AT")
+    sync_parser.add_argument("--since", help="Only on the first sync: earliest last_shown date (yyyy-mm-dd)")
+    sync_parser.add_argument("--path", help=f"Snapshot file (default: {GOOGLE_SNAPSHOT_PATH})")
+    args = parser.parse_args()
+
+    if args.command == "sync":
+        sync_snapshot(args.region.upper(), since=args.since, path=args.path)
@@ -0,0 +1,146 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import HTTP_BACKOFF_BASE_SECONDS, HTTP_BACKOFF_MAX_SECONDS, HTTP_MAX_RETRIES, PLATFORM_HTTP_SETTINGS
+from utils import rate_limit
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request while a platform's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stop calling a platform after repeated failures and probe it again after a cooldown."""
+
+    def __init__(self, failure_threshold, cooldown_seconds):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown_seconds = float(cooldown_seconds)
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def before_request(self, platform):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.cooldown_seconds - (time.monotonic() - self._opened_at)
+            if remaining > 0:
+                raise CircuitOpenError(
+                    f"{platform} circuit is open after {self._failures} consecutive failures; "
+                    f"skipping requests for another {remaining:.0f}s."
+                )
+            # Half-open: let this request through as a probe. A failure re-opens the circuit.
+            self._opened_at = None
+            self._failures = self.failure_threshold - 1
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self, platform):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold and self._opened_at is None:
+                self._opened_at = time.monotonic()
+                print(f"[{platform}] Circuit opened after {self._failures} consecutive failures.")
+
+
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+CIRCUIT_BREAKERS = {
+    platform: CircuitBreaker(settings["failure_threshold"], settings["cooldown_seconds"])
+    for platform, settings in PLATFORM_HTTP_SETTINGS.items()
+}
+
+
+def get_session(platform):
+    """Return the shared keep-alive session for a platform, creating it on first use."""
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(platform)
+        if session is None:
+            pool_size = PLATFORM_HTTP_SETTINGS[platform]["pool_size"]
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _SESSIONS[platform] = session
+        return session
+
+
+def _retry_after_seconds(response):
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_seconds(attempt, response=None):
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+    delay = random.uniform(0, min(HTTP_BACKOFF_MAX_SECONDS, HTTP_BACKOFF_BASE_SECONDS * (2 ** attempt)))
+    retry_after = _retry_after_seconds(response)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, HTTP_BACKOFF_MAX_SECONDS))
+    return delay
+
+
+def request(platform, method, url, max_retries=None, **kwargs):
+    """Send a rate-limited request over the platform's pooled session.
+
+    Retries connection errors, timeouts, 429 and 5xx responses with jittered
+    exponential backoff. Returns the last response (callers keep handling
+    non-2xx status codes themselves) or raises the last connection error.
+    Raises CircuitOpenError while the platform is failing consistently.
+    """
+    settings = PLATFORM_HTTP_SETTINGS[platform]
+    breaker = CIRCUIT_BREAKERS[platform]
+    max_retries = HTTP_MAX_RETRIES if max_retries is None else max(0, int(max_retries))
+    kwargs.setdefault("timeout", settings["timeout"])
+    session = get_session(platform)
+
+    for attempt in range(max_retries + 1):
+        breaker.before_request(platform)
+        rate_limit(platform)
+        response = None
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            breaker.record_failure(platform)
+            if attempt >= max_retries:
+                raise
+            print(f"[{platform}] Request failed ({exc.__class__.__name__}), retrying ({attempt + 1}/{max_retries})...")
+        else:
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                breaker.record_success()
+                return response
+            breaker.record_failure(platform)
+            if attempt >= max_retries:
+                return response
+            print(f"[{platform}] HTTP {response.status_code}, retrying ({attempt + 1}/{max_retries})...")
+
+        time.sleep(backoff_seconds(attempt, response))
+
+    return response
+
+
+def get(platform, url, **kwargs):
+    return request(platform, "GET", url, **kwargs)
+
+
+def post(platform, url, **kwargs):
+    return request(platform, "POST", url, **kwargs)
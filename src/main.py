@@ -1,20 +1,33 @@
-from google_sheets import (
-    clear_results_sheets,
-    read_search_terms,
-    write_tiktok_results_to_sheet,
-    write_meta_results_to_sheet,
-    write_google_results_to_sheet,
-)
-from meta_ads import query_meta_ads
+from sinks import close_sinks, parse_sink_names, start_sinks, write_results
+from search_terms import read_search_terms_csv
+from meta_ads import MetaFetchError, get_meta_fields, iter_meta_ad_pages, query_meta_ads_batched
 from tiktok_ads import query_tiktok_ads_with_details
-from google_ads import query_google_ad_library
+from google_ads import query_google_ad_library, query_google_ad_library_batch
+from config import (
+    GOOGLE_ADS_SOURCE,
+    GOOGLE_BIGQUERY_COLUMNS,
+    GOOGLE_MAX_CONCURRENCY,
+    META_FIELD_PROFILE,
+    META_MAX_CONCURRENCY,
+    SEARCH_TERMS_FILE,
+    TIKTOK_MAX_CONCURRENCY,
+)
+from response_cache import RESPONSE_CACHE, TIKTOK_DETAIL_CACHE
+from scheduler import CrawlScheduler
+from watermarks import WATERMARKS
+from result_rows import set_breakdown_country
+from utils import PartialResults, print_rate_limit_report, reset_rate_limit_stats
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 
 
 def result_count(results):
-    """Return a robust count for list-like API results."""
+    """Return a robust count for list-like API results and Arrow tables."""
     if isinstance(results, list):
         return len(results)
+    if hasattr(results, "num_rows"):
+        return results.num_rows
     return 0
 
 
@@ -31,93 +44,365 @@ def parse_date(date_str, output_format=None):
         print(f"Error parsing date '{date_str}': {e}")
         return None
 
-def main(collect_meta_ads=False, max_results_per_platform=500, country_code=None):
-    print("Clearing results sheets before crawler start...")
-    clear_results_sheets()
-    search_terms = read_search_terms()
-    all_meta_ads = []
-    max_results_per_platform = int(max_results_per_platform) if max_results_per_platform else 500
-    country_code = country_code or "AT"
+def _meta_cache_key(term, date_from, date_to, max_results, country_code, field_profile=None):
+    return term, date_from, date_to, country_code, max_results, field_profile or META_FIELD_PROFILE
 
-    for entry in search_terms:
-        term = entry["term"]
-        date_from = entry["date_from"]
-        date_to = entry["date_to"]
-        fetch_meta = entry["fetch_meta"]
-        fetch_tiktok = entry["fetch_tiktok"]
-        fetch_google = entry["fetch_google"]
-        meta_count = 0
-        tiktok_count = 0
-        google_count = 0
-
-        # Parse dates consistently
-        meta_date_from = parse_date(date_from, "%Y-%m-%d")  # For Meta (yyyy-mm-dd format)
-        meta_date_to = parse_date(date_to, "%Y-%m-%d")      # For Meta (yyyy-mm-dd format)
-        tiktok_min_date = parse_date(date_from, "%Y%m%d")  # For TikTok (yyyyMMdd format)
-        tiktok_max_date = parse_date(date_to, "%Y%m%d")    # For TikTok (yyyyMMdd format)
-        google_date_from = parse_date(date_from, "%Y-%m-%d")  # For Google (yyyy-mm-dd format)
-        google_date_to = parse_date(date_to, "%Y-%m-%d")      # For Google (yyyy-mm-dd format)
-
-        if fetch_meta:
-            print(f"Fetching Meta data for term '{term}' from {meta_date_from} to {meta_date_to}...")
-            if not meta_date_from or not meta_date_to:
-                print(f"Skipping Meta fetch for term '{term}' due to invalid dates.")
-                continue
-            meta_results = query_meta_ads(
-                term,
-                delivery_date_min=meta_date_from,
-                delivery_date_max=meta_date_to,
-                max_ads=max_results_per_platform,
-                country_code=country_code,
-            )
-            if collect_meta_ads and isinstance(meta_results, list):
-                all_meta_ads.extend(meta_results)
-            meta_count = result_count(meta_results)
-            print(f"{meta_count} Meta results for term '{term}'")
-            if meta_count > 0:
-                print(f"Writing Meta results for term '{term}'...")
-                write_meta_results_to_sheet(meta_results, term)
-            print("-" * 100)
-
-        if fetch_tiktok:
-            print(f"Fetching TikTok data for term '{term}' from {tiktok_min_date} to {tiktok_max_date}...")
-            if not tiktok_min_date or not tiktok_max_date:
-                print(f"Skipping TikTok fetch for term '{term}' due to invalid dates.")
+
+def _google_cache_key(term, date_from, date_to, max_results, country_code):
+    return term, str(date_from), str(date_to), country_code, max_results, GOOGLE_BIGQUERY_COLUMNS, GOOGLE_ADS_SOURCE
+
+
+def run_meta_for_term(term, date_from, date_to, max_results, country_code, field_profile=None):
+    """Fetch and write Meta results for one term. Returns the fetched ads."""
+    meta_date_from = parse_date(date_from, "%Y-%m-%d")  # For Meta (yyyy-mm-dd format)
+    meta_date_to = parse_date(date_to, "%Y-%m-%d")      # For Meta (yyyy-mm-dd format)
+    print(f"Fetching Meta data for term '{term}' from {meta_date_from} to {meta_date_to}...")
+    if not meta_date_from or not meta_date_to:
+        print(f"Skipping Meta fetch for term '{term}' due to invalid dates.")
+        return None
+    # Rows are written page by page while the next page is already loading.
+    meta_results = []
+    pages = RESPONSE_CACHE.cached_pages(
+        "meta",
+        _meta_cache_key(term, meta_date_from, meta_date_to, max_results, country_code, field_profile),
+        f"Meta term '{term}'",
+        lambda: iter_meta_ad_pages(
+            term,
+            delivery_date_min=meta_date_from,
+            delivery_date_max=meta_date_to,
+            max_ads=max_results,
+            country_code=country_code,
+            field_profile=field_profile,
+        ),
+    )
+    write_error = None
+    try:
+        for page_ads in pages:
+            meta_results.extend(page_ads)
+            if write_error is not None:
                 continue
-            tiktok_results = query_tiktok_ads_with_details(
-                term,
-                tiktok_min_date,
-                tiktok_max_date,
-                max_results=max_results_per_platform,
-                country_code=country_code,
+            print(f"Writing {len(page_ads)} Meta results for term '{term}'...")
+            try:
+                write_results("meta", page_ads, term)
+            except Exception as exc:
+                # Finish the fetch anyway so the complete result is cached and a re-run needs no API calls.
+                print(f"Writing Meta results for term '{term}' failed: {exc}. Finishing the fetch for the cache.")
+                write_error = exc
+    except MetaFetchError as exc:
+        # The pages written so far stay; the incomplete result is not cached.
+        print(exc)
+        meta_results = PartialResults(meta_results)
+    if write_error is not None:
+        raise write_error
+    print(f"{len(meta_results)} Meta results for term '{term}'")
+    print("-" * 100)
+    return meta_results
+
+
+def run_tiktok_for_term(term, date_from, date_to, max_results, country_code):
+    """Fetch and write TikTok results for one term. Returns the fetched ads."""
+    tiktok_min_date = parse_date(date_from, "%Y%m%d")  # For TikTok (yyyyMMdd format)
+    tiktok_max_date = parse_date(date_to, "%Y%m%d")    # For TikTok (yyyyMMdd format)
+    print(f"Fetching TikTok data for term '{term}' from {tiktok_min_date} to {tiktok_max_date}...")
+    if not tiktok_min_date or not tiktok_max_date:
+        print(f"Skipping TikTok fetch for term '{term}' due to invalid dates.")
+        return None
+    tiktok_results = RESPONSE_CACHE.cached(
+        "tiktok",
+        (term, tiktok_min_date, tiktok_max_date, country_code, max_results),
+        f"TikTok term '{term}'",
+        lambda: query_tiktok_ads_with_details(
+            term,
+            tiktok_min_date,
+            tiktok_max_date,
+            max_results=max_results,
+            country_code=country_code,
+        ),
+    )
+    tiktok_count = result_count(tiktok_results)
+    print(f"{tiktok_count} TikTok results for term '{term}'")
+    if tiktok_count > 0:
+        print(f"Writing TikTok results for term '{term}'...")
+        write_results("tiktok", tiktok_results, term)
+    print("-" * 100)
+    return tiktok_results
+
+
+def run_google_for_term(term, date_from, date_to, max_results, country_code):
+    """Fetch and write Google results for one term. Returns the fetched rows."""
+    google_date_from = parse_date(date_from, "%Y-%m-%d")  # For Google (yyyy-mm-dd format)
+    google_date_to = parse_date(date_to, "%Y-%m-%d")      # For Google (yyyy-mm-dd format)
+    print(f"Fetching Google data for term '{term}' from {google_date_from} to {google_date_to}...")
+    if not google_date_from or not google_date_to:
+        print(f"Skipping Google fetch for term '{term}' due to invalid dates.")
+        return None
+    google_results = RESPONSE_CACHE.cached(
+        "google",
+        _google_cache_key(term, google_date_from, google_date_to, max_results, country_code),
+        f"Google term '{term}'",
+        lambda: query_google_ad_library(
+            term,
+            google_date_from,
+            google_date_to,
+            max_results=max_results,
+            country_code=country_code,
+        ),
+    )
+    google_count = result_count(google_results)
+    print(f"{google_count} Google results for term '{term}'")
+    if google_count > 0:
+        print(f"Writing Google results for term '{term}'...")
+        write_results("google", google_results, term)
+    print("-" * 100)
+    return google_results
+
+
+def build_platform_runners(meta_field_profile=None):
+    """Return platform key -> (entry flag, runner, max parallel jobs in concurrent mode)."""
+    return {
+        "meta": ("fetch_meta", partial(run_meta_for_term, field_profile=meta_field_profile), META_MAX_CONCURRENCY),
+        "tiktok": ("fetch_tiktok", run_tiktok_for_term, TIKTOK_MAX_CONCURRENCY),
+        "google": ("fetch_google", run_google_for_term, GOOGLE_MAX_CONCURRENCY),
+    }
+
+
+def _batch_searches(search_terms, flag, platform_label, date_format):
+    """Collect (term index, (term, date_from, date_to)) for every term enabled for a platform."""
+    indexes = []
+    searches = []
+    for index, entry in enumerate(search_terms):
+        if not entry[flag]:
+            continue
+        term = entry["term"]
+        date_from = parse_date(entry["date_from"], date_format)
+        date_to = parse_date(entry["date_to"], date_format)
+        if not date_from or not date_to:
+            print(f"Skipping {platform_label} fetch for term '{term}' due to invalid dates.")
+            continue
+        indexes.append(index)
+        searches.append((term, date_from, date_to))
+    return indexes, searches
+
+
+def _write_batched_results(platform_label, indexes, searches, batched_results, platform):
+    results_by_index = {}
+    for index, (term, _, _), results in zip(indexes, searches, batched_results):
+        results_by_index[index] = results
+        count = result_count(results)
+        print(f"{count} {platform_label} results for term '{term}'")
+        if count > 0:
+            print(f"Writing {platform_label} results for term '{term}'...")
+            write_results(platform, results, term)
+    print("-" * 100)
+    return results_by_index
+
+
+def _cached_batch(platform, platform_label, searches, cache_key, fetch_batch):
+    """Serve searches from the response cache and fetch only the misses with one batched call."""
+    keys = [RESPONSE_CACHE.make_key(platform, *cache_key(search)) for search in searches]
+    results = [RESPONSE_CACHE.get(platform, key)[0] for key in keys]
+    misses = [position for position, cached in enumerate(results) if cached is None]
+    if len(misses) < len(searches):
+        print(f"Using cached {platform_label} results for {len(searches) - len(misses)} of {len(searches)} terms.")
+    if misses:
+        fetched = fetch_batch([searches[position] for position in misses])
+        for position, platform_results in zip(misses, fetched):
+            results[position] = platform_results
+            RESPONSE_CACHE.put(platform, keys[position], platform_results)
+    return results
+
+
+def run_meta_batched(search_terms, max_results, country_code, field_profile=None):
+    """Fetch Meta results for all Meta-enabled terms through Graph API batch calls, then write them per term."""
+    indexes, searches = _batch_searches(search_terms, "fetch_meta", "Meta", "%Y-%m-%d")
+    if not searches:
+        return {}
+
+    print(f"Fetching Meta data for {len(searches)} terms in batched mode...")
+    batched_results = _cached_batch(
+        "meta",
+        "Meta",
+        searches,
+        lambda search: _meta_cache_key(*search, max_results, country_code, field_profile),
+        lambda misses: query_meta_ads_batched(
+            misses, max_ads=max_results, country_code=country_code, field_profile=field_profile
+        ),
+    )
+    return _write_batched_results("Meta", indexes, searches, batched_results, "meta")
+
+
+def run_google_batched(search_terms, max_results, country_code):
+    """Fetch Google results for all Google-enabled terms with one BigQuery scan, then write them per term."""
+    indexes, searches = _batch_searches(search_terms, "fetch_google", "Google", "%Y-%m-%d")
+    if not searches:
+        return {}
+
+    print(f"Fetching Google data for {len(searches)} terms in one BigQuery query...")
+    batched_results = _cached_batch(
+        "google",
+        "Google",
+        searches,
+        lambda search: _google_cache_key(*search, max_results, country_code),
+        lambda misses: query_google_ad_library_batch(misses, max_results=max_results, country_code=country_code),
+    )
+    return _write_batched_results("Google", indexes, searches, batched_results, "google")
+
+
+def _fetched_completely(results, max_results):
+    """True when a fetch returned every matching ad: it did not fail and was not cut off at ``max_results``."""
+    if results is None or isinstance(results, PartialResults):
+        return False
+    return result_count(results) < max_results
+
+
+def _record_watermark(platform, term, country_code, date_from, date_to, results, max_results):
+    if _fetched_completely(results, max_results):
+        WATERMARKS.record(platform, term, country_code, date_from, date_to)
+    else:
+        print(f"Keeping the {platform} watermark of term '{term}': the fetch failed or reached {max_results} results.")
+
+
+def incremental_runner(platform, runner):
+    """Wrap a per-term runner to resume at the term's watermark and advance it after a complete fetch."""
+    def run(term, date_from, date_to, max_results, country_code):
+        start = WATERMARKS.window_start(platform, term, country_code, date_from, date_to)
+        if start != date_from:
+            print(f"Incremental {platform} fetch for term '{term}' from {start} instead of {date_from}.")
+        results = runner(term, start, date_to, max_results, country_code)
+        _record_watermark(platform, term, country_code, start, date_to, results, max_results)
+        return results
+
+    return run
+
+
+def incremental_batch_runner(platform, flag, batch_runner):
+    """Batched counterpart of ``incremental_runner``: shift every enabled term's window, then record watermarks."""
+    def run(search_terms, max_results, country_code):
+        shifted = [
+            dict(entry, date_from=WATERMARKS.window_start(
+                platform, entry["term"], country_code, entry["date_from"], entry["date_to"]
+            )) if entry[flag] else entry
+            for entry in search_terms
+        ]
+        results_by_index = batch_runner(shifted, max_results, country_code)
+        for index, results in results_by_index.items():
+            entry = shifted[index]
+            _record_watermark(
+                platform, entry["term"], country_code, entry["date_from"], entry["date_to"], results, max_results
             )
-            tiktok_count = result_count(tiktok_results)
-            print(f"{tiktok_count} TikTok results for term '{term}'")
-            if tiktok_count > 0:
-                print(f"Writing TikTok results for term '{term}'...")
-                write_tiktok_results_to_sheet(tiktok_results, term)
-            print("-" * 100)
-
-        if fetch_google:
-            print(f"Fetching Google data for term '{term}' from {google_date_from} to {google_date_to}...")
-            if not google_date_from or not google_date_to:
-                print(f"Skipping Google fetch for term '{term}' due to invalid dates.")
+        return results_by_index
+
+    return run
+
+
+def _run_terms_sequentially(platform_runners, search_terms, max_results, country_code):
+    """Run every enabled platform for each term, one call after another."""
+    meta_results_by_index = {}
+    for index, entry in enumerate(search_terms):
+        for platform, (flag, runner, _) in platform_runners.items():
+            if not entry[flag]:
                 continue
-            google_results = query_google_ad_library(
-                term,
-                google_date_from,
-                google_date_to,
-                max_results=max_results_per_platform,
-                country_code=country_code,
-            )
-            google_count = result_count(google_results)
-            print(f"{google_count} Google results for term '{term}'")
-            if google_count > 0:
-                print(f"Writing Google results for term '{term}'...")
-                write_google_results_to_sheet(google_results, term)
-            print("-" * 100)
+            results = runner(entry["term"], entry["date_from"], entry["date_to"], max_results, country_code)
+            if platform == "meta":
+                meta_results_by_index[index] = results
+    return meta_results_by_index
+
+
+def _run_crawl(platform_runners, batch_runners, search_terms, max_results, country_code, concurrent):
+    """Run all per-term and batched jobs and return Meta results keyed by term index."""
+    meta_results_by_index = {}
+    if concurrent:
+        scheduler = CrawlScheduler(platform_runners)
+        with ThreadPoolExecutor(max_workers=max(1, len(batch_runners)), thread_name_prefix="batch") as batch_executor:
+            batch_futures = {
+                platform: batch_executor.submit(runner, search_terms, max_results, country_code)
+                for platform, runner in batch_runners.items()
+            }
+            results = scheduler.run(search_terms, max_results, country_code)
+            batch_results = {platform: future.result() for platform, future in batch_futures.items()}
+        meta_results_by_index.update({
+            index: platform_results
+            for (index, platform), platform_results in results.items()
+            if platform == "meta"
+        })
+        scheduler.report()
+    else:
+        batch_results = {
+            platform: runner(search_terms, max_results, country_code)
+            for platform, runner in batch_runners.items()
+        }
+        meta_results_by_index.update(
+            _run_terms_sequentially(platform_runners, search_terms, max_results, country_code)
+        )
+        print_rate_limit_report()
+    meta_results_by_index.update(batch_results.get("meta", {}))
+    return meta_results_by_index
+
+
+def _read_search_terms():
+    if SEARCH_TERMS_FILE:
+        print(f"Reading search terms from '{SEARCH_TERMS_FILE}'...")
+        return read_search_terms_csv(SEARCH_TERMS_FILE)
+    # Imported here so runs with a search terms file need no Google Sheets credentials.
+    from google_sheets import read_search_terms
+
+    return read_search_terms()
+
+
+def main(collect_meta_ads=False, max_results_per_platform=500, country_code=None, concurrent=False,
+         meta_field_profile=None, meta_batch=False, google_batch=False, sinks=None, refresh_cache=False,
+         incremental=False):
+    """Crawl every search term and write the results to the chosen sinks (default: RESULT_SINKS).
+
+    With ``refresh_cache`` every query goes to the APIs; fresh responses still replace cached ones.
+    With ``incremental`` the sinks keep their results and each term and platform is only
+    fetched from its watermark on (see watermarks.py).
+    """
+    # Fail fast on an unknown profile instead of after clearing the result sheets.
+    get_meta_fields(meta_field_profile)
+    sink_names = parse_sink_names(sinks)
+    RESPONSE_CACHE.force_refresh = bool(refresh_cache)
+    TIKTOK_DETAIL_CACHE.force_refresh = bool(refresh_cache)
+    platform_runners = build_platform_runners(meta_field_profile)
+    # Batched platforms run once for all terms instead of once per term.
+    batch_runners = {}
+    if meta_batch:
+        platform_runners.pop("meta")
+        batch_runners["meta"] = partial(run_meta_batched, field_profile=meta_field_profile)
+    if google_batch:
+        platform_runners.pop("google")
+        batch_runners["google"] = run_google_batched
+    if incremental:
+        platform_runners = {
+            platform: (flag, incremental_runner(platform, runner), limit)
+            for platform, (flag, runner, limit) in platform_runners.items()
+        }
+        batch_runners = {
+            platform: incremental_batch_runner(platform, f"fetch_{platform}", runner)
+            for platform, runner in batch_runners.items()
+        }
+    start_sinks(sink_names, incremental=incremental)
+    search_terms = _read_search_terms()
+    all_meta_ads = []
+    max_results_per_platform = int(max_results_per_platform) if max_results_per_platform else 500
+    country_code = country_code or "AT"
+    set_breakdown_country(country_code)
+    reset_rate_limit_stats()
+
+    try:
+        meta_results_by_index = _run_crawl(
+            platform_runners, batch_runners, search_terms, max_results_per_platform, country_code, concurrent
+        )
+    finally:
+        # Write rows still buffered by the sinks, also when a job aborted the run.
+        close_sinks()
 
     if collect_meta_ads:
+        # Keep the sheet order of terms regardless of which job finished first.
+        for index in sorted(meta_results_by_index):
+            meta_results = meta_results_by_index[index]
+            if isinstance(meta_results, list):
+                all_meta_ads.extend(meta_results)
         return {"meta_ads": all_meta_ads}
 
     return None
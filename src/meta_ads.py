@@ -1,7 +1,24 @@
 import requests
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit
 from dotenv import load_dotenv
-from config import META_APP_ID, META_APP_SECRET, update_env_file
+import http_client
+from config import (
+    META_APP_ID,
+    META_APP_SECRET,
+    META_FIELD_PROFILE,
+    META_MIN_REQUESTS_PER_SECOND,
+    META_THROTTLE_MAX_PAUSE_SECONDS,
+    META_THROTTLE_RETRIES,
+    META_USAGE_CEILING,
+    PLATFORM_RATE_LIMITS,
+    update_env_file,
+)
+from utils import RATE_LIMITERS, PartialResults
 
 # Load environment variables from .env file
 load_dotenv()
@@ -10,6 +27,143 @@ load_dotenv()
 class MetaTokenExpiredError(Exception):
     """Raised when the Meta access token is missing, invalid, or expired."""
 
+
+class MetaFetchError(Exception):
+    """Raised when a Meta page cannot be fetched; the pages before it were already yielded."""
+
+
+META_GRAPH_URL = "https://graph.facebook.com/v22.0"
+META_BATCH_SIZE = 50  # Graph API maximum number of sub-requests per batch call
+META_BATCH_MAX_ROUNDS_WITHOUT_PROGRESS = 3
+
+# Named ads_archive field projections. The demographic breakdowns in "reach"/"full"
+# make pages many times larger than ID-and-creative pages.
+_META_BASE_FIELDS = [
+    "id", "page_id", "page_name", "ad_delivery_start_time", "ad_delivery_stop_time", "ad_snapshot_url",
+]
+_META_CREATIVE_FIELDS = [
+    "ad_creation_time", "ad_creative_bodies", "ad_creative_link_captions", "ad_creative_link_descriptions",
+    "ad_creative_link_titles", "publisher_platforms", "bylines", "beneficiary_payers",
+]
+_META_REACH_FIELDS = [
+    "currency", "spend", "impressions", "eu_total_reach", "estimated_audience_size", "target_ages",
+    "target_gender", "target_locations", "age_country_gender_reach_breakdown", "delivery_by_region",
+    "demographic_distribution",
+]
+META_FIELD_PROFILES = {
+    "minimal": _META_BASE_FIELDS,
+    "creative": _META_BASE_FIELDS + _META_CREATIVE_FIELDS,
+    "reach": _META_BASE_FIELDS + _META_REACH_FIELDS,
+    "full": _META_BASE_FIELDS + _META_CREATIVE_FIELDS + _META_REACH_FIELDS,
+}
+
+
+def get_meta_fields(field_profile=None):
+    """Return the comma-separated ads_archive fields for a named profile."""
+    field_profile = field_profile or META_FIELD_PROFILE
+    if field_profile not in META_FIELD_PROFILES:
+        raise ValueError(
+            f"Unknown Meta field profile '{field_profile}'. Choose one of: {', '.join(META_FIELD_PROFILES)}."
+        )
+    return ",".join(META_FIELD_PROFILES[field_profile])
+
+
+# Graph API error codes for app, user, page and ads-library rate limiting.
+META_THROTTLING_ERROR_CODES = {4, 17, 32, 613, 80004}
+
+
+class MetaUsageGovernor:
+    """Adjust the Meta request rate from the usage headers Meta returns on every response.
+
+    X-App-Usage and X-Business-Use-Case-Usage report how much of the hourly
+    quota (call count, CPU time, total time) is used, in percent. The rate is
+    halved while usage is above the ceiling and raised again while it is
+    comfortably below it, so the crawler runs at the highest safe rate.
+    """
+
+    def __init__(self, limiter, ceiling, min_rate, max_rate):
+        self.limiter = limiter
+        self.ceiling = ceiling
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.last_usage = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _parse_usage(response):
+        """Return (highest usage percent, seconds until access is regained) from the usage headers."""
+        usages = []
+        regain_seconds = 0
+        app_usage = response.headers.get("X-App-Usage")
+        if app_usage:
+            try:
+                usages.append(json.loads(app_usage))
+            except ValueError:
+                pass
+        business_usage = response.headers.get("X-Business-Use-Case-Usage")
+        if business_usage:
+            try:
+                for entries in json.loads(business_usage).values():
+                    for entry in entries:
+                        usages.append(entry)
+                        regain_seconds = max(regain_seconds, 60 * float(entry.get("estimated_time_to_regain_access") or 0))
+            except (ValueError, AttributeError, TypeError):
+                pass
+        if not usages:
+            return None, regain_seconds
+
+        highest = 0.0
+        for usage in usages:
+            for key in ("call_count", "total_cputime", "total_time"):
+                try:
+                    highest = max(highest, float(usage.get(key) or 0))
+                except (TypeError, ValueError):
+                    pass
+        return highest, regain_seconds
+
+    def observe(self, response):
+        """Update the request rate from one response; the budget is only logged when the rate changes."""
+        usage, regain_seconds = self._parse_usage(response)
+        if usage is None:
+            return
+        with self._lock:
+            self.last_usage = usage
+            previous_rate = rate = self.limiter.rate
+            if self.max_rate <= 0:
+                pass  # Rate limiting disabled via META_REQUESTS_PER_SECOND=0; only report usage.
+            elif usage >= self.ceiling:
+                rate = max(self.min_rate, rate / 2)
+            elif usage < self.ceiling * 0.8:
+                rate = min(self.max_rate, rate * 1.25)
+            self.limiter.set_rate(rate)
+        if rate != previous_rate:
+            print(
+                f"[meta] Usage {usage:.0f}% of {self.ceiling:.0f}% ceiling "
+                f"({max(0.0, self.ceiling - usage):.0f}% budget left), request rate {rate:.2f} req/s"
+            )
+        if regain_seconds > 0:
+            self.pause(regain_seconds)
+
+    def throttled(self, retry_after_seconds=None):
+        """React to a rate-limit error: drop to the minimum rate and wait before the next request."""
+        if self.max_rate > 0:
+            with self._lock:
+                self.limiter.set_rate(self.min_rate)
+        self.pause(retry_after_seconds or 60)
+
+    def pause(self, seconds):
+        seconds = min(float(seconds), META_THROTTLE_MAX_PAUSE_SECONDS)
+        print(f"[meta] Rate limit reached. Pausing Meta requests for {seconds:.0f}s.")
+        time.sleep(seconds)
+
+
+META_USAGE_GOVERNOR = MetaUsageGovernor(
+    RATE_LIMITERS["meta"],
+    ceiling=META_USAGE_CEILING,
+    min_rate=META_MIN_REQUESTS_PER_SECOND,
+    max_rate=PLATFORM_RATE_LIMITS["meta"]["rate"],
+)
+
 def exchange_user_token_for_long_lived_token(user_token):
     """Exchange a short-lived user token for a long-lived token."""
     url = "https://graph.facebook.com/v22.0/oauth/access_token"
@@ -20,7 +174,7 @@ def exchange_user_token_for_long_lived_token(user_token):
         "fb_exchange_token": user_token,
     }
 
-    response = requests.get(url, params=params)
+    response = http_client.get("meta", url, params=params)
     data = response.json()
 
     if "access_token" in data:
@@ -49,16 +203,70 @@ def refresh_meta_access_token(short_lived_token):
     os.environ["META_ACCESS_TOKEN"] = long_lived_token
     return long_lived_token
 
-def query_meta_ads(term, delivery_date_min=None, delivery_date_max=None, max_ads=500, country_code=None):
-    """Query Meta Ads Library with automatic token refresh."""
+def _decode_json(response):
+    """Decode a response body once; None if it is not valid JSON."""
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+def _meta_error_code(data):
+    """Return the Graph API error code of a decoded response payload, or None."""
+    error = data.get("error") if isinstance(data, dict) else None
+    return error.get("code") if isinstance(error, dict) else None
+
+def _fetch_meta_page(url, headers, params):
+    """Fetch and decode one ads_archive page. Returns the JSON payload, or None on errors."""
+    throttle_retries = 0
+    while True:
+        try:
+            response = http_client.get("meta", url, headers=headers, params=params)
+        except requests.RequestException as exc:
+            print(f"Error querying Meta Ads API: {exc}")
+            return None
+
+        META_USAGE_GOVERNOR.observe(response)
+        # Pages with reach breakdowns are large; the body is decoded only once.
+        data = _decode_json(response)
+        if _meta_error_code(data) in META_THROTTLING_ERROR_CODES and throttle_retries < META_THROTTLE_RETRIES:
+            # Wait for the quota to recover and retry the same page instead of dropping the rest.
+            throttle_retries += 1
+            META_USAGE_GOVERNOR.throttled()
+            continue
+        break
+
+    if response.status_code != 200:
+        print(f"Error querying Meta Ads API: {response.status_code} - {response.text}")
+        return None
+
+    if not isinstance(data, dict):
+        print("Meta API returned an invalid JSON response.")
+        return None
+
+    # Check for token errors
+    if "error" in data:
+        error_code = data["error"].get("code")
+        if error_code == 190 or error_code == 10:  # Token expired or invalid
+            raise MetaTokenExpiredError(
+                "Meta access token expired or invalid. Refresh it in the browser UI and retry."
+            )
+        else:
+            print(f"Meta API error: {data['error']}")
+            return None
+
+    return data
+
+def _get_meta_token():
     # Read the access token from the .env file
-    token = os.getenv("META_ACCESS_TOKEN").strip()
+    token = (os.getenv("META_ACCESS_TOKEN") or "").strip()
     if not token:
         raise MetaTokenExpiredError(
             "META_ACCESS_TOKEN is missing. Refresh it in the web UI before querying Meta Ads."
         )
-    url = "https://graph.facebook.com/v22.0/ads_archive"
-    headers = {"Authorization": f"Bearer {token}"}
+    return token
+
+def _build_search_params(term, delivery_date_min, delivery_date_max, country_code, field_profile):
+    """Build the ads_archive query parameters for one search term (without the access token)."""
     params = {
         "search_terms": term,
         # "search_type": "KEYWORD_EXACT_PHRASE",
@@ -66,8 +274,7 @@ def query_meta_ads(term, delivery_date_min=None, delivery_date_max=None, max_ads
         "ad_active_status": "ALL",
         "ad_reached_countries": [country_code or 'AT'],  # Country code from UI selection
         "limit": 200,  # Maximum number of results per page
-        "access_token": token,
-        "fields": "id,ad_creation_time,ad_creative_bodies,ad_creative_link_captions,ad_creative_link_descriptions,ad_creative_link_titles,ad_delivery_start_time,ad_delivery_stop_time,ad_snapshot_url,age_country_gender_reach_breakdown,beneficiary_payers,bylines,currency,delivery_by_region,demographic_distribution,estimated_audience_size,eu_total_reach,impressions,page_id,page_name,publisher_platforms,spend,target_ages,target_gender,target_locations"
+        "fields": get_meta_fields(field_profile),
     }
 
     # Add delivery date filters if provided
@@ -75,51 +282,185 @@ def query_meta_ads(term, delivery_date_min=None, delivery_date_max=None, max_ads
         params["ad_delivery_date_min"] = delivery_date_min #.strftime("%Y-%m-%d")
     if delivery_date_max:
         params["ad_delivery_date_max"] = delivery_date_max #.strftime("%Y-%m-%d")
+    return params
+
+def iter_meta_ad_pages(term, delivery_date_min=None, delivery_date_max=None, max_ads=500, country_code=None,
+                       field_profile=None):
+    """Yield Meta ads page by page, capped at ``max_ads`` in total.
+
+    As soon as a page's ``paging.next`` cursor is known, the next page is
+    requested and decoded on a background thread while the caller processes
+    the current page. Raises MetaFetchError when a page cannot be fetched.
+    """
+    token = _get_meta_token()
+    url = f"{META_GRAPH_URL}/ads_archive"
+    headers = {"Authorization": f"Bearer {token}"}
+    params = _build_search_params(term, delivery_date_min, delivery_date_max, country_code, field_profile)
+    params["access_token"] = token
 
+    max_ads = int(max_ads) if max_ads else 500
+    yielded = 0
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="meta-prefetch")
+    try:
+        pending_page = executor.submit(_fetch_meta_page, url, headers, params)
+        while pending_page is not None:
+            data = pending_page.result()
+            if data is None:
+                raise MetaFetchError(f"Meta pagination for term '{term}' stopped after {yielded} ads.")
+
+            # Add the current page of ads (capped at max_ads)
+            page_ads = data.get("data", [])[: max_ads - yielded]
+            yielded += len(page_ads)
+
+            # Start loading the next page before handing this one to the caller.
+            # The next page URL already includes all query params.
+            next_url = data.get("paging", {}).get("next")
+            pending_page = None
+            if next_url and yielded < max_ads:
+                pending_page = executor.submit(_fetch_meta_page, next_url, headers, {})
+
+            if page_ads:
+                yield page_ads
+            if yielded >= max_ads:
+                print(f"Reached Meta ad cap of {max_ads} entries. Stopping pagination.")
+                return
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def query_meta_ads(term, delivery_date_min=None, delivery_date_max=None, max_ads=500, country_code=None,
+                   field_profile=None):
+    """Query Meta Ads Library and return all ads as one list (PartialResults if a page failed)."""
     all_ads = []  # List to store all ad details
+    pages = iter_meta_ad_pages(
+        term,
+        delivery_date_min=delivery_date_min,
+        delivery_date_max=delivery_date_max,
+        max_ads=max_ads,
+        country_code=country_code,
+        field_profile=field_profile,
+    )
+    try:
+        for page_ads in pages:
+            all_ads.extend(page_ads)
+    except MetaFetchError as exc:
+        print(exc)
+        return PartialResults(all_ads)
+    return all_ads
+
+
+def _relative_graph_url(next_url):
+    """Turn an absolute paging.next URL into a batch relative_url (path below the API version)."""
+    parts = urlsplit(next_url)
+    path = parts.path.lstrip("/")
+    version_prefix = urlsplit(META_GRAPH_URL).path.lstrip("/") + "/"
+    if path.startswith(version_prefix):
+        path = path[len(version_prefix):]
+    query = urlencode([(key, value) for key, value in parse_qsl(parts.query) if key != "access_token"])
+    return f"{path}?{query}" if query else path
+
+def query_meta_ads_batched(searches, max_ads=500, country_code=None, field_profile=None):
+    """Query many search terms through Graph API batch requests.
+
+    ``searches`` is a list of ``(term, delivery_date_min, delivery_date_max)``.
+    First pages and continuation cursors of all terms are packed into batch
+    calls of up to 50 sub-requests. Returns one list of ads per search, in
+    the order of ``searches``; searches that ended with an error or were
+    still pending when the batch gave up are PartialResults.
+    """
+    token = _get_meta_token()
     max_ads = int(max_ads) if max_ads else 500
-    while url:
-        response = requests.get(url, headers=headers, params=params)
+    results = [[] for _ in searches]
+    pending = {}  # search index -> relative_url of the next page to fetch
+    failed = set()  # search indexes whose pagination ended with an error
 
-        if response.status_code != 200:
-            print(f"Error querying Meta Ads API: {response.status_code} - {response.text}")
-            return all_ads
+    def finished_results():
+        return [
+            PartialResults(ads) if index in pending or index in failed else ads
+            for index, ads in enumerate(results)
+        ]
 
-        try:
-            data = response.json()
-        except ValueError:
-            print("Meta API returned an invalid JSON response.")
-            return all_ads
-
-        # Check for token errors
-        if "error" in data:
-            error_code = data["error"].get("code")
-            if error_code == 190 or error_code == 10:  # Token expired or invalid
+    for index, (term, delivery_date_min, delivery_date_max) in enumerate(searches):
+        params = _build_search_params(term, delivery_date_min, delivery_date_max, country_code, field_profile)
+        pending[index] = f"ads_archive?{urlencode(params, doseq=True)}"
+
+    rounds_without_progress = 0
+    while pending:
+        progressed = False
+        indexes = list(pending)
+        for start in range(0, len(indexes), META_BATCH_SIZE):
+            chunk = indexes[start:start + META_BATCH_SIZE]
+            batch = [{"method": "GET", "relative_url": pending[index]} for index in chunk]
+            try:
+                response = http_client.post(
+                    "meta", META_GRAPH_URL, data={"access_token": token, "batch": json.dumps(batch)}
+                )
+            except requests.RequestException as exc:
+                print(f"Error querying Meta Ads API (batch): {exc}")
+                return finished_results()
+
+            META_USAGE_GOVERNOR.observe(response)
+            sub_responses = _decode_json(response)
+            error_code = _meta_error_code(sub_responses)
+            if error_code == 190 or error_code == 10:
                 raise MetaTokenExpiredError(
                     "Meta access token expired or invalid. Refresh it in the browser UI and retry."
                 )
-            else:
-                print(f"Meta API error: {data['error']}")
-                return all_ads
-
-        # Add the current page of ads to the list (capped at max_ads)
-        page_ads = data.get("data", [])
-        remaining_capacity = max_ads - len(all_ads)
-        if remaining_capacity <= 0:
-            break
-        all_ads.extend(page_ads[:remaining_capacity])
-        if len(all_ads) >= max_ads:
-            print(f"Reached Meta ad cap of {max_ads} entries. Stopping pagination.")
-            break
+            if error_code in META_THROTTLING_ERROR_CODES:
+                META_USAGE_GOVERNOR.throttled()
+                continue
+            if response.status_code != 200:
+                print(f"Error querying Meta Ads API (batch): {response.status_code} - {response.text}")
+                return finished_results()
 
-        # Get the next page URL from the "paging" field
-        paging = data.get("paging", {})
-        url = paging.get("next")  # Set the URL to the next page, or None if no more pages
+            if not isinstance(sub_responses, list):
+                print("Meta API returned an invalid JSON batch response.")
+                return finished_results()
 
-        # Clear params for subsequent requests (next page URL already includes them)
-        params = {}
+            throttled = False
+            for index, sub_response in zip(chunk, sub_responses):
+                term = searches[index][0]
+                if sub_response is None:
+                    # Sub-request timed out on Meta's side; it stays pending for the next round.
+                    continue
+                try:
+                    data = json.loads(sub_response.get("body") or "{}")
+                except ValueError:
+                    print(f"Meta API returned an invalid JSON response for term '{term}'.")
+                    pending.pop(index)
+                    failed.add(index)
+                    continue
 
-    return all_ads
+                if "error" in data:
+                    error_code = data["error"].get("code")
+                    if error_code == 190 or error_code == 10:  # Token expired or invalid
+                        raise MetaTokenExpiredError(
+                            "Meta access token expired or invalid. Refresh it in the browser UI and retry."
+                        )
+                    if error_code in META_THROTTLING_ERROR_CODES:
+                        throttled = True
+                        continue
+                    print(f"Meta API error for term '{term}': {data['error']}")
+                    pending.pop(index)
+                    failed.add(index)
+                    continue
+
+                progressed = True
+                page_ads = data.get("data", [])[: max_ads - len(results[index])]
+                results[index].extend(page_ads)
+                next_url = data.get("paging", {}).get("next")
+                if next_url and len(results[index]) < max_ads:
+                    pending[index] = _relative_graph_url(next_url)
+                else:
+                    pending.pop(index)
+            if throttled:
+                META_USAGE_GOVERNOR.throttled()
+
+        rounds_without_progress = 0 if progressed else rounds_without_progress + 1
+        if rounds_without_progress >= META_BATCH_MAX_ROUNDS_WITHOUT_PROGRESS:
+            print(f"Meta batch made no progress for {rounds_without_progress} rounds. Giving up on {len(pending)} terms.")
+            break
+
+    return finished_results()
 
 
 def test_query_meta_ads(search_term="nike", max_ads=500):
@@ -0,0 +1,262 @@
+"""Persistent caches for ad library responses, in one SQLite file (RESPONSE_CACHE_PATH).
+
+ResponseCache holds whole query results keyed by platform, term, country and
+date window; entries expire after a per-platform TTL and are evicted least
+recently used first once the cache grows past RESPONSE_CACHE_MAX_MB. Set a
+platform's TTL to 0 to disable it. AdDetailCache holds TikTok ad details by ad ID.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from config import (
+    RESPONSE_CACHE_MAX_MB,
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_TTL_HOURS,
+    TIKTOK_DETAIL_CACHE_TTL_HOURS,
+    TIKTOK_DETAIL_ENDED_DAYS,
+)
+from utils import PartialResults
+
+
+def _cacheable(results):
+    """Only keep real, non-empty results; errors, partial and empty answers are fetched again next time."""
+    if isinstance(results, PartialResults):
+        return False
+    if isinstance(results, list):
+        return bool(results)
+    return bool(getattr(results, "num_rows", 0))
+
+
+class ResponseCache:
+    """SQLite-backed TTL cache with a size limit and LRU eviction."""
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+                 ttl_hours=RESPONSE_CACHE_TTL_HOURS):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = {platform: hours * 3600 for platform, hours in ttl_hours.items()}
+        # Set per run: skip lookups but still store the fresh responses.
+        self.force_refresh = False
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        """Open the database for one transaction, committed on success; the connection is closed afterwards."""
+        if not self._ready:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                if not self._ready:
+                    connection.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS responses (
+                            key TEXT PRIMARY KEY,
+                            platform TEXT NOT NULL,
+                            value BLOB NOT NULL,
+                            size INTEGER NOT NULL,
+                            created_at REAL NOT NULL,
+                            last_used REAL NOT NULL
+                        )
+                        """
+                    )
+                    self._ready = True
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def make_key(platform, *parts):
+        return hashlib.sha256(json.dumps([platform, *parts], default=str).encode("utf-8")).hexdigest()
+
+    def enabled(self, platform):
+        return self.ttl_seconds.get(platform, 0) > 0 and self.max_bytes > 0
+
+    def get(self, platform, key):
+        """Return ``(results, age_seconds)`` for a fresh entry, or ``(None, None)``."""
+        if not self.enabled(platform) or self.force_refresh:
+            return None, None
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            row = connection.execute(
+                "SELECT value, created_at FROM responses WHERE key = ? AND platform = ?", [key, platform]
+            ).fetchone()
+            if row is None:
+                return None, None
+            value, created_at = row
+            if now - created_at > self.ttl_seconds[platform]:
+                connection.execute("DELETE FROM responses WHERE key = ?", [key])
+                return None, None
+            connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", [now, key])
+        return pickle.loads(value), now - created_at
+
+    def put(self, platform, key, results):
+        """Store results and evict least recently used entries beyond the size limit."""
+        if not self.enabled(platform) or not _cacheable(results):
+            return
+        value = pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, platform, value, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [key, platform, value, len(value), now, now],
+            )
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            evict = []
+            for entry_key, size in connection.execute("SELECT key, size FROM responses ORDER BY last_used"):
+                if total <= self.max_bytes:
+                    break
+                evict.append((entry_key,))
+                total -= size
+            connection.executemany("DELETE FROM responses WHERE key = ?", evict)
+
+    def cached(self, platform, key_parts, label, fetch):
+        """Return cached results for ``key_parts`` or call ``fetch()`` and store what it returns."""
+        key = self.make_key(platform, *key_parts)
+        results, age_seconds = self.get(platform, key)
+        if results is not None:
+            print(f"Using cached {label} results (fetched {age_seconds / 60:.0f} min ago).")
+            return results
+        results = fetch()
+        self.put(platform, key, results)
+        return results
+
+    def cached_pages(self, platform, key_parts, label, fetch_pages):
+        """Like ``cached`` for fetches that yield their results page by page.
+
+        A cached result is yielded as a single page. Otherwise the pages of
+        ``fetch_pages()`` are passed on as they arrive and stored as one list
+        once the fetch has run to completion; nothing is stored when it raises.
+        Callers should consume every page even when handling one fails, so a
+        finished fetch is cached regardless of what happens to its pages.
+        """
+        key = self.make_key(platform, *key_parts)
+        results, age_seconds = self.get(platform, key)
+        if results is not None:
+            print(f"Using cached {label} results (fetched {age_seconds / 60:.0f} min ago).")
+            yield results
+            return
+        results = []
+        for page in fetch_pages():
+            results.extend(page)
+            yield page
+        self.put(platform, key, results)
+
+
+RESPONSE_CACHE = ResponseCache()
+
+
+def _parse_shown_date(value):
+    """Parse a TikTok shown date (yyyyMMdd as int or string, or yyyy-mm-dd); None if unknown."""
+    digits = "".join(character for character in str(value or "") if character.isdigit())[:8]
+    try:
+        return datetime.strptime(digits, "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+class AdDetailCache:
+    """TikTok ad details by ad ID.
+
+    Ads whose last_shown_date is more than TIKTOK_DETAIL_ENDED_DAYS days ago no
+    longer change and are kept permanently; details of ads that may still be
+    running expire after TIKTOK_DETAIL_CACHE_TTL_HOURS (0 disables the cache).
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, ttl_hours=TIKTOK_DETAIL_CACHE_TTL_HOURS,
+                 ended_days=TIKTOK_DETAIL_ENDED_DAYS):
+        self.path = path
+        self.ttl_seconds = ttl_hours * 3600
+        self.ended_days = ended_days
+        self.force_refresh = False
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        """Like ``ResponseCache._connect``, for the ad detail table."""
+        if not self._ready:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                if not self._ready:
+                    connection.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS tiktok_ad_details (
+                            ad_id TEXT PRIMARY KEY,
+                            value BLOB NOT NULL,
+                            fetched_at REAL NOT NULL,
+                            expires_at REAL
+                        )
+                        """
+                    )
+                    self._ready = True
+                yield connection
+        finally:
+            connection.close()
+
+    def _expires_at(self, details, now):
+        """None (never) for ads that ended long enough ago, otherwise now + TTL."""
+        ad = ((details or {}).get("data") or {}).get("ad") or {}
+        last_shown = _parse_shown_date(ad.get("last_shown_date"))
+        if last_shown and last_shown < date.today() - timedelta(days=self.ended_days):
+            return None
+        return now + self.ttl_seconds
+
+    def get_many(self, ad_ids):
+        """Return ``{ad_id: details}`` for every ID with a fresh entry, in one lookup per 500 IDs."""
+        if self.ttl_seconds <= 0 or self.force_refresh or not ad_ids:
+            return {}
+        now = time.time()
+        found = {}
+        ad_ids = [str(ad_id) for ad_id in ad_ids]
+        with self._lock, self._connect() as connection:
+            for start in range(0, len(ad_ids), 500):
+                chunk = ad_ids[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = connection.execute(
+                    f"SELECT ad_id, value FROM tiktok_ad_details WHERE ad_id IN ({placeholders}) "
+                    "AND (expires_at IS NULL OR expires_at > ?)",
+                    [*chunk, now],
+                )
+                found.update((ad_id, pickle.loads(value)) for ad_id, value in rows)
+        return found
+
+    def put_many(self, details_by_id):
+        """Store freshly fetched details, ``{ad_id: details}``."""
+        if self.ttl_seconds <= 0 or not details_by_id:
+            return
+        now = time.time()
+        rows = [
+            (str(ad_id), pickle.dumps(details, protocol=pickle.HIGHEST_PROTOCOL), now, self._expires_at(details, now))
+            for ad_id, details in details_by_id.items()
+            if ((details.get("error") or {}).get("code") or "ok") == "ok"
+        ]
+        if not rows:
+            return
+        with self._lock, self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO tiktok_ad_details (ad_id, value, fetched_at, expires_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+
+TIKTOK_DETAIL_CACHE = AdDetailCache()
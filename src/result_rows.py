@@ -0,0 +1,228 @@
+"""Row builders for the result tables shared by every result sink.
+
+Each platform has a fixed header list; Meta additionally gets one
+"<country> - <age> - <gender>" reach column per breakdown cell.
+"""
+from datetime import datetime
+
+from config import META_BREAKDOWN_ALL_COUNTRIES, META_BREAKDOWN_COUNTRIES
+
+
+TIKTOK_HEADERS = [
+    "Timestamp", "Search Term", "Ad ID", "Business Name", "Paid For By", "First Shown Date", "Last Shown Date",
+    "Status", "Status Statement", "Reach (Unique Users)", "Reach by Country",
+    "Targeted Countries", "Targeted Interests", "Targeted Gender", "Targeted Age",
+    "Number of Users Targeted", "Video URL", "Video Cover Image URL", "Image URL"
+]
+
+
+def tiktok_rows(results, search_term, timestamp):
+    """Build one Results_TikTok row per ad, aligned to TIKTOK_HEADERS."""
+    rows = []
+    for result in results:
+        data = result.get("data", {})
+        advertiser = data.get("advertiser", {})
+        ad = data.get("ad", {})
+        ad_group = data.get("ad_group", {})
+        targeting_info = ad_group.get("targeting_info", {})
+        reach = ad.get("reach", {})
+
+        # Extract targeting details
+        targeted_gender = ", ".join(
+            [gender for gender, targeted in targeting_info.get("gender", {}).items() if targeted]
+        )
+        targeted_age = ", ".join(
+            [age for age, targeted in targeting_info.get("age", {}).items() if targeted]
+        )
+
+        # Convert "Reach by Country" dictionary to a string
+        reach_by_country = ", ".join(
+            [f"{country}: {count}" for country, count in reach.get("unique_users_seen_by_country", {}).items()]
+        )
+
+        row = [
+            timestamp,  # Timestamp
+            search_term,  # Search Term
+            ad.get("id", ""),
+            advertiser.get("business_name", ""),
+            advertiser.get("paid_for_by", ""),
+            ad.get("first_shown_date", ""),
+            ad.get("last_shown_date", ""),
+            ad.get("status", ""),
+            ad.get("status_statement", ""),
+            reach.get("unique_users_seen", ""),
+            reach_by_country,  # Converted dictionary to string
+            ", ".join(targeting_info.get("country", [])),
+            targeting_info.get("interest", ""),
+            targeted_gender,
+            targeted_age,
+            targeting_info.get("number_of_users_targeted", ""),
+            ad.get("videos", [{}])[0].get("url", "") if ad.get("videos") else "",
+            ad.get("videos", [{}])[0].get("cover_image_url", "") if ad.get("videos") else "",
+            ad.get("image_urls", [])[0] if ad.get("image_urls") else "",
+        ]
+        rows.append(row)
+    return rows
+
+
+def _first(values):
+    """Meta usually returns lists for creative fields, but we only need the first entry."""
+    return values[0] if values else None
+
+
+def _bounds(value):
+    value = value or {}
+    return f"{value.get('lower_bound', '')} - {value.get('upper_bound', '')}"
+
+
+# Results_Meta columns after "Timestamp" and "Search Term": (header, Graph API field, value extractor).
+# A column is only filled when its field was requested by the Meta field profile of the run.
+META_COLUMNS = [
+    ("Ad ID", "id", lambda r: r.get("id", "")),
+    ("Ad Creation Time", "ad_creation_time", lambda r: r.get("ad_creation_time", "")),
+    ("Ad Creative Bodies", "ad_creative_bodies", lambda r: _first(r.get("ad_creative_bodies"))),
+    ("Ad Creative Link Captions", "ad_creative_link_captions", lambda r: _first(r.get("ad_creative_link_captions"))),
+    ("Ad Creative Link Descriptions", "ad_creative_link_descriptions", lambda r: _first(r.get("ad_creative_link_descriptions"))),
+    ("Ad Creative Link Titles", "ad_creative_link_titles", lambda r: _first(r.get("ad_creative_link_titles"))),
+    ("Ad Delivery Start Time", "ad_delivery_start_time", lambda r: r.get("ad_delivery_start_time", "")),
+    ("Ad Delivery Stop Time", "ad_delivery_stop_time", lambda r: r.get("ad_delivery_stop_time", "")),
+    ("Ad Snapshot URL", "ad_snapshot_url", lambda r: r.get("ad_snapshot_url", "")),
+    ("Currency", "currency", lambda r: r.get("currency", "")),
+    ("Delivery by Region", "delivery_by_region", lambda r: "\n".join(
+        [f"{region.get('region', '')}: {region.get('percentage', '')}" for region in r.get("delivery_by_region", [])]
+    )),
+    ("Demographic Distribution", "demographic_distribution", lambda r: "\n".join(
+        [f"Age: {demo.get('age', '')}, Gender: {demo.get('gender', '')}, Percentage: {demo.get('percentage', '')}" for demo in r.get("demographic_distribution", [])]
+    )),
+    ("Estimated Audience Size", "estimated_audience_size", lambda r: _bounds(r.get("estimated_audience_size"))),
+    ("EU Total Reach", "eu_total_reach", lambda r: r.get("eu_total_reach", "")),
+    ("Impressions", "impressions", lambda r: _bounds(r.get("impressions"))),
+    ("Page ID", "page_id", lambda r: r.get("page_id", "")),
+    ("Page Name", "page_name", lambda r: r.get("page_name", "")),
+    ("Publisher Platforms", "publisher_platforms", lambda r: ", ".join(r.get("publisher_platforms", []))),
+    ("Beneficiary Payers", "beneficiary_payers", lambda r: ", ".join(
+        [f"{payer.get('payer', '')}" for payer in r.get("beneficiary_payers", [])]
+    )),
+    ("Spend", "spend", lambda r: _bounds(r.get("spend"))),
+    ("Target Ages", "target_ages", lambda r: "-".join(r.get("target_ages", []))),
+    ("Target Gender", "target_gender", lambda r: r.get("target_gender", "")),
+    ("Target Locations", "target_locations", lambda r: "\n".join(
+        [f"{loc.get('name', '')} (Excluded: {loc.get('excluded', False)})" for loc in r.get("target_locations", [])]
+    )),
+]
+META_HEADERS = ["Timestamp", "Search Term"] + [header for header, _, _ in META_COLUMNS]
+META_GENDERS = [("male", "Male"), ("female", "Female"), ("unknown", "Unknown")]
+# Countries that get breakdown columns in the current run (see set_breakdown_country).
+_breakdown_countries = META_BREAKDOWN_COUNTRIES or {"AT"}
+
+
+def set_breakdown_country(country_code):
+    """Give the run's country breakdown columns unless META_BREAKDOWN_COUNTRIES names countries or "all"."""
+    global _breakdown_countries
+    if not META_BREAKDOWN_COUNTRIES:
+        _breakdown_countries = {(country_code or "AT").upper()}
+
+
+def meta_reach_breakdowns(result):
+    """Yield (column, reach) for each "<country> - <age> - <gender>" cell of an ad's reach breakdown."""
+    for breakdown in result.get("age_country_gender_reach_breakdown", []):
+        country = breakdown.get("country", "")
+        if not META_BREAKDOWN_ALL_COUNTRIES and country not in _breakdown_countries:
+            continue
+        for age_gender in breakdown.get("age_gender_breakdowns", []):
+            age_range = age_gender.get("age_range", "")
+            for key, label in META_GENDERS:
+                yield f"{country} - {age_range} - {label}", age_gender.get(key, 0)
+
+
+def meta_breakdown_columns(results):
+    """Return the reach breakdown columns that occur in a list of Meta ads."""
+    return {column for result in results for column, _ in meta_reach_breakdowns(result)}
+
+
+def meta_missing_value(result):
+    """Value of breakdown columns an ad has no reach in: 0 if the ad has a reach breakdown, else empty."""
+    return 0 if "age_country_gender_reach_breakdown" in result else ""
+
+
+def meta_rows(results, search_term, timestamp, headers=None):
+    """Build Results_Meta rows and return ``(headers, rows)``.
+
+    Values are placed by header name. Without ``headers`` the header is
+    META_HEADERS plus the sorted breakdown columns of these results.
+    """
+    if headers is None:
+        headers = META_HEADERS + sorted(meta_breakdown_columns(results))
+
+    rows = []
+    for result in results:
+        values = {"Timestamp": timestamp, "Search Term": search_term}
+        for header, field, extract in META_COLUMNS:
+            values[header] = extract(result) if field in result else ""
+
+        # Add dynamic columns for age_range and gender combinations
+        for column, reach in meta_reach_breakdowns(result):
+            values[column] = values.get(column, 0) + reach
+
+        # Breakdown columns the ad has no reach in stay 0
+        rows.append([values.get(header, meta_missing_value(result)) for header in headers])
+    return headers, rows
+
+
+GOOGLE_COLUMNS = [
+    ("Advertiser ID", "advertiser_id"),
+    ("Creative ID", "creative_id"),
+    ("Creative Page URL", "creative_page_url"),
+    ("Ad Format Type", "ad_format_type"),
+    ("Advertiser Disclosed Name", "advertiser_disclosed_name"),
+    ("Advertiser Legal Name", "advertiser_legal_name"),
+    ("Advertiser Location", "advertiser_location"),
+    ("Advertiser Verification Status", "advertiser_verification_status"),
+    ("Region Code", "region_code"),
+    ("First Shown", "first_shown"),
+    ("Last Shown", "last_shown"),
+    ("Times Shown Start Date", "times_shown_start_date"),
+    ("Times Shown End Date", "times_shown_end_date"),
+    ("Times Shown Lower Bound", "times_shown_lower_bound"),
+    ("Times Shown Upper Bound", "times_shown_upper_bound"),
+    ("Demographic Info", "demographic_info"),
+    ("Geo Location", "geo_location"),
+    ("Contextual Signals", "contextual_signals"),
+    ("Customer Lists", "customer_lists"),
+    ("Topics of Interest", "topics_of_interest"),
+]
+GOOGLE_HEADERS = ["Timestamp", "Search Term"] + [header for header, _ in GOOGLE_COLUMNS]
+
+
+def google_result_columns(results):
+    """Return one value list per GOOGLE_COLUMNS entry, read column by column.
+
+    ``results`` is either a list of row dicts or a pyarrow Table from the
+    Storage Read API fast path; Arrow columns are converted without building
+    intermediate row dicts. Columns missing from the result stay empty.
+    """
+    if hasattr(results, "column_names"):
+        available = set(results.column_names)
+        return [
+            results.column(field).to_pylist() if field in available else [None] * results.num_rows
+            for _, field in GOOGLE_COLUMNS
+        ]
+    return [[result.get(field) for result in results] for _, field in GOOGLE_COLUMNS]
+
+
+def google_rows(results, search_term, timestamp):
+    """Build one Results_Google row per creative, aligned to GOOGLE_HEADERS."""
+    columns = google_result_columns(results)
+    return [[timestamp, search_term, *values] for values in zip(*columns)]
+
+
+def build_rows(platform, results, search_term):
+    """Return ``(headers, rows)`` for one platform's results of a term."""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if platform == "meta":
+        return meta_rows(results, search_term, timestamp)
+    if platform == "tiktok":
+        return TIKTOK_HEADERS, tiktok_rows(results, search_term, timestamp)
+    if platform == "google":
+        return GOOGLE_HEADERS, google_rows(results, search_term, timestamp)
+    raise ValueError(f"Unknown platform '{platform}'.")
@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils import print_rate_limit_report
+
+
+class CrawlScheduler:
+    """Run many (term, platform) jobs at once with one bounded worker pool per platform.
+
+    The pools bound how many terms a platform works on in parallel; the token
+    buckets in utils.RATE_LIMITERS bound how fast each platform is called, so
+    throughput follows each platform's quota instead of a serial term loop.
+    """
+
+    def __init__(self, platform_runners):
+        # platform -> (entry flag, runner, max parallel jobs)
+        self.platform_runners = platform_runners
+        self.started_at = None
+
+    def run(self, search_terms, max_results, country_code):
+        """Run all enabled jobs and return platform results keyed by (term index, platform)."""
+        self.started_at = time.monotonic()
+        executors = {
+            platform: ThreadPoolExecutor(max_workers=max(1, limit), thread_name_prefix=f"{platform}-worker")
+            for platform, (_, _, limit) in self.platform_runners.items()
+        }
+        futures = {}
+        results = {}
+        try:
+            for index, entry in enumerate(search_terms):
+                for platform, (flag, runner, _) in self.platform_runners.items():
+                    if not entry[flag]:
+                        continue
+                    future = executors[platform].submit(
+                        runner, entry["term"], entry["date_from"], entry["date_to"], max_results, country_code
+                    )
+                    futures[future] = (index, platform, entry["term"])
+
+            for completed, future in enumerate(as_completed(futures), start=1):
+                index, platform, term = futures[future]
+                # Re-raises errors such as MetaTokenExpiredError so the run aborts like in sequential mode.
+                results[(index, platform)] = future.result()
+                print(f"Finished {platform} job for term '{term}' ({completed}/{len(futures)}).")
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        return results
+
+    def report(self):
+        """Print elapsed wall time and the request rate each platform achieved."""
+        if self.started_at is None:
+            return
+        print(f"Crawl finished in {time.monotonic() - self.started_at:.1f}s.")
+        print_rate_limit_report()
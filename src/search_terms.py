@@ -0,0 +1,33 @@
+"""Search term rows: term, date window and per-platform flags, from the sheet or a local CSV file."""
+import csv
+
+
+def parse_search_term_rows(rows):
+    """Turn "Search terms" rows (header row first) into search term dicts."""
+    # Skip the header row and process the data
+    search_terms = []
+    for row in rows[1:]:  # Skip the header row
+        term = row[0]  # Column A: Search term
+        date_from = row[1] if len(row) > 1 else None  # Column B: Date from (yyyy-mm-dd)
+        date_to = row[2] if len(row) > 2 else None  # Column C: Date to (yyyy-mm-dd)
+        fetch_meta = row[3].strip().lower() == "x" if len(row) > 3 else False  # Column D: Meta flag
+        fetch_tiktok = row[4].strip().lower() == "x" if len(row) > 4 else False  # Column E: TikTok flag
+        fetch_google = row[5].strip().lower() == "x" if len(row) > 5 else False  # Column F: Google flag
+
+        # Append the processed data as a dictionary
+        search_terms.append({
+            "term": term,
+            "date_from": date_from,
+            "date_to": date_to,
+            "fetch_meta": fetch_meta,
+            "fetch_tiktok": fetch_tiktok,
+            "fetch_google": fetch_google
+        })
+
+    return search_terms
+
+
+def read_search_terms_csv(path):
+    """Read search terms from a CSV file laid out like the "Search terms" sheet."""
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        return parse_search_term_rows(list(csv.reader(handle)))
@@ -0,0 +1,301 @@
+"""Result sinks: where a run writes its Meta, TikTok and Google results.
+
+``RESULT_SINKS`` (or the ``sinks`` argument of ``main.main``) picks any mix of
+``sheets``, ``sqlite``, ``parquet`` and ``csv``. Local sinks write below
+``RESULTS_DIR`` and need no Google credentials, so a run can also be done
+fully offline.
+"""
+import csv
+import os
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import closing
+from datetime import datetime
+
+from config import RESULT_SINKS, RESULTS_DIR
+from result_rows import build_rows
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+RESULT_TABLES = {"meta": "results_meta", "tiktok": "results_tiktok", "google": "results_google"}
+# Column identifying an ad within a term's rows; SQLite upserts replace rows with the same term and key.
+RESULT_KEYS = {"meta": "ad_id", "tiktok": "ad_id", "google": "creative_id"}
+
+
+class ResultSink(ABC):
+    """Receives the results of one platform and term; subclasses decide where they go."""
+
+    name = None
+    # Whether a run that keeps earlier results can write here without duplicating ads.
+    supports_incremental = True
+
+    def start_run(self, incremental=False):
+        """Prepare the sink before the first write of a run; incremental runs keep earlier results."""
+
+    @abstractmethod
+    def write_results(self, platform, results, search_term):
+        """Write one platform's results for a search term."""
+
+    def close(self):
+        """Write anything still buffered at the end of a run."""
+
+
+class SheetsSink(ResultSink):
+    """The Results_* worksheets of the configured Google Sheet.
+
+    Cleared at the start of a full run. Sheets rows can only be appended, so an
+    incremental run only adds ads not yet written for the same term; rows that
+    are already there keep the values of the run that wrote them.
+    """
+
+    name = "sheets"
+
+    def __init__(self):
+        # Imported here so local sinks work without Google Sheets credentials.
+        import google_sheets
+
+        self._sheets = google_sheets
+        self._writers = {
+            "meta": google_sheets.write_meta_results_to_sheet,
+            "tiktok": google_sheets.write_tiktok_results_to_sheet,
+            "google": google_sheets.write_google_results_to_sheet,
+        }
+
+    def start_run(self, incremental=False):
+        self._sheets.start_workbook_session()
+        if incremental:
+            print("Incremental run: keeping existing rows in the results sheets.")
+            self._sheets.resume_result_shards()
+            return
+        print("Clearing results sheets before crawler start...")
+        self._sheets.clear_results_sheets()
+
+    def write_results(self, platform, results, search_term):
+        self._writers[platform](results, search_term)
+
+    def close(self):
+        self._sheets.flush_sheet_writes()
+
+
+class LocalSink(ResultSink):
+    """Base for file sinks: builds the result rows once and writes them in bulk."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or RESULTS_DIR
+        self.run_id = None
+        self._lock = threading.Lock()
+
+    def start_run(self, incremental=False):
+        self.run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def write_results(self, platform, results, search_term):
+        headers, rows = build_rows(platform, results, search_term)
+        if rows:
+            with self._lock:
+                self.write_rows(platform, headers, rows)
+
+    @abstractmethod
+    def write_rows(self, platform, headers, rows):
+        """Write result rows aligned to ``headers``; called with the sink's lock held."""
+
+    def _partition(self, kind, platform):
+        """Directory of one platform and run, e.g. ``<RESULTS_DIR>/parquet/platform=meta/run=20240101-120000``."""
+        path = os.path.join(self.directory, kind, f"platform={platform}", f"run={self.run_id}")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _next_part(self, path, extension):
+        part = len([name for name in os.listdir(path) if name.endswith(extension)]) + 1
+        return os.path.join(path, f"part-{part:05d}{extension}")
+
+
+def _sqlite_column(header):
+    """Column name for a header: lower case, non-alphanumerics replaced by underscores."""
+    return re.sub(r"[^0-9a-z]+", "_", header.lower()).strip("_")
+
+
+class SQLiteSink(LocalSink):
+    """One table per platform in ``<RESULTS_DIR>/results.sqlite``, cleared at the start of a full run.
+
+    Rows are upserted by search term and ad ID (RESULT_KEYS), so incremental
+    runs replace updated ads and keep the rest. New Meta breakdown columns are
+    added with ALTER TABLE as they appear.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, directory=None):
+        super().__init__(directory)
+        self.path = os.path.join(self.directory, "results.sqlite")
+
+    def _columns(self, connection, table):
+        return [row[1] for row in connection.execute(f'PRAGMA table_info("{table}")')]
+
+    def start_run(self, incremental=False):
+        super().start_run(incremental)
+        if incremental:
+            return
+        with closing(sqlite3.connect(self.path)) as connection, connection:
+            for table in RESULT_TABLES.values():
+                if self._columns(connection, table):
+                    connection.execute(f'DELETE FROM "{table}"')
+
+    def write_rows(self, platform, headers, rows):
+        table = RESULT_TABLES[platform]
+        columns = [_sqlite_column(header) for header in headers]
+        with closing(sqlite3.connect(self.path)) as connection, connection:
+            existing = self._columns(connection, table)
+            if not existing:
+                column_list = ", ".join(f'"{column}"' for column in columns)
+                connection.execute(f'CREATE TABLE "{table}" ({column_list})')
+            else:
+                for column in columns:
+                    if column not in existing:
+                        connection.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}"')
+            self._delete_replaced_rows(connection, platform, columns, rows)
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            placeholders = ", ".join("?" for _ in columns)
+            connection.executemany(
+                f'INSERT INTO "{table}" ({column_list}) VALUES ({placeholders})',
+                [[_sqlite_value(value) for value in row] for row in rows],
+            )
+
+    def _delete_replaced_rows(self, connection, platform, columns, rows):
+        """Delete stored rows of the same term and ad ID as the incoming rows."""
+        key = RESULT_KEYS[platform]
+        if key not in columns or "search_term" not in columns:
+            return
+        term_position, key_position = columns.index("search_term"), columns.index(key)
+        connection.executemany(
+            f'DELETE FROM "{RESULT_TABLES[platform]}" WHERE "search_term" = ? AND "{key}" = ?',
+            {(_sqlite_value(row[term_position]), _sqlite_value(row[key_position])) for row in rows},
+        )
+
+
+def _sqlite_value(value):
+    """SQLite stores numbers and text; nested API values are stored as their string form."""
+    if value is None or isinstance(value, (int, float, str, bytes)):
+        return value
+    return str(value)
+
+
+def _arrow_column(values):
+    """Build an Arrow array, falling back to strings for columns with mixed value types."""
+    values = [None if value == "" else value for value in values]
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+
+class ParquetSink(LocalSink):
+    """Parquet part files partitioned by platform and run below ``<RESULTS_DIR>/parquet``."""
+
+    name = "parquet"
+    supports_incremental = False
+
+    def __init__(self, directory=None):
+        if pa is None:
+            raise RuntimeError("The Parquet sink needs the 'pyarrow' package. Install it with 'pip install pyarrow'.")
+        super().__init__(directory)
+
+    def write_rows(self, platform, headers, rows):
+        columns = list(zip(*rows))
+        table = pa.table({header: _arrow_column(list(values)) for header, values in zip(headers, columns)})
+        pq.write_table(table, self._next_part(self._partition("parquet", platform), ".parquet"))
+
+
+class CSVSink(LocalSink):
+    """CSV files partitioned by platform and run below ``<RESULTS_DIR>/csv``.
+
+    Rows are appended to the current part file; a new part starts when the
+    header changes, e.g. when new Meta breakdown columns appear.
+    """
+
+    name = "csv"
+    supports_incremental = False
+
+    def __init__(self, directory=None):
+        super().__init__(directory)
+        self._parts = {}  # platform -> (path, headers)
+
+    def start_run(self, incremental=False):
+        super().start_run(incremental)
+        self._parts.clear()
+
+    def write_rows(self, platform, headers, rows):
+        path, part_headers = self._parts.get(platform, (None, None))
+        new_part = part_headers != headers
+        if new_part:
+            path = self._next_part(self._partition("csv", platform), ".csv")
+            self._parts[platform] = (path, list(headers))
+        with open(path, "a", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            if new_part:
+                writer.writerow(headers)
+            writer.writerows(rows)
+
+
+SINK_TYPES = {sink.name: sink for sink in (SheetsSink, SQLiteSink, ParquetSink, CSVSink)}
+_ACTIVE_SINKS = []
+
+
+def parse_sink_names(names=None):
+    """Return sink names from a list or a comma-separated string, defaulting to RESULT_SINKS."""
+    if names is None:
+        names = RESULT_SINKS
+    if isinstance(names, str):
+        names = names.split(",")
+    names = [name.strip().lower() for name in names if name and name.strip()]
+    unknown = [name for name in names if name not in SINK_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown result sink(s) {', '.join(unknown)}. Choose from: {', '.join(SINK_TYPES)}.")
+    return names or ["sheets"]
+
+
+def start_sinks(names=None, incremental=False):
+    """Create and start the sinks of a run; they receive every later ``write_results`` call.
+
+    Incremental runs are refused for sinks that only append new files per run,
+    since every run would add the ads of the overlapping window again.
+    """
+    names = parse_sink_names(names)
+    if incremental:
+        append_only = [name for name in names if not SINK_TYPES[name].supports_incremental]
+        if append_only:
+            raise ValueError(
+                f"Incremental runs need sinks that skip or replace written ads; "
+                f"{', '.join(append_only)} only append. Use sheets or sqlite, or run without incremental."
+            )
+    sinks = [SINK_TYPES[name]() for name in names]
+    for sink in sinks:
+        sink.start_run(incremental)
+    _ACTIVE_SINKS[:] = sinks
+    return sinks
+
+
+def write_results(platform, results, search_term):
+    """Write one platform's results for a term to every active sink."""
+    for sink in _ACTIVE_SINKS:
+        sink.write_results(platform, results, search_term)
+
+
+def close_sinks():
+    """Flush every active sink; all of them are closed even if one fails."""
+    error = None
+    for sink in _ACTIVE_SINKS:
+        try:
+            sink.close()
+        except Exception as exc:
+            print(f"Could not finish writing to the {sink.name} sink: {exc}")
+            error = error or exc
+    if error is not None:
+        raise error
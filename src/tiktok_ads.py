@@ -1,14 +1,29 @@
 import requests
+import threading
+import http_client
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import islice
 from config import (
     TIKTOK_CLIENT_KEY,
     TIKTOK_CLIENT_SECRET,
     TIKTOK_ACCESS_TOKEN,
+    TIKTOK_QUERY_PAGE_SIZE,
+    TIKTOK_DETAIL_WORKERS,
+    TIKTOK_DETAIL_RETRIES,
 )
+from response_cache import TIKTOK_DETAIL_CACHE
+from utils import PartialResults
 
 TOKEN_EXPIRATION_TIME = 7200  # Token validity in seconds (2 hours)
 TOKEN_LAST_REFRESHED = time.time()
+# Serializes token refreshes so parallel detail workers trigger at most one refresh at a time.
+_TOKEN_LOCK = threading.Lock()
+
+
+class TikTokQueryError(Exception):
+    """Raised when a TikTok query page cannot be fetched; the IDs before it were already yielded."""
 
 def get_client_access_token():
     """Obtain a new client access token from TikTok."""
@@ -21,8 +36,12 @@ def get_client_access_token():
         "client_secret": TIKTOK_CLIENT_SECRET,
         "grant_type": "client_credentials",
     }
-    response = requests.post(url, headers=headers, data=data)
-    response_data = response.json()
+    try:
+        response = http_client.post("tiktok", url, headers=headers, data=data)
+        response_data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        print("Failed to obtain access token:", e)
+        return None
     if response.status_code == 200:
         access_token = response_data.get("access_token")
         expires_in = response_data.get("expires_in")
@@ -40,19 +59,37 @@ def is_token_expired():
     """Check if the current access token has expired."""
     return time.time() - TOKEN_LAST_REFRESHED >= TOKEN_EXPIRATION_TIME
 
-def query_tiktok_ads(search_term, min_date, max_date, country_code=None):
-    """Query TikTok Ads using the Commercial Content API."""
-    global TIKTOK_ACCESS_TOKEN
-    if is_token_expired():
-        print("TikTok access token expired. Refreshing token...")
-        TIKTOK_ACCESS_TOKEN = get_client_access_token()
-        if not TIKTOK_ACCESS_TOKEN:
-            print("Failed to refresh access token.")
-            return None
-        
+def get_access_token(stale_token=None):
+    """Return a valid access token, refreshing it at most once across threads.
+
+    Pass the token that was just rejected as ``stale_token`` to force a refresh;
+    if another thread already replaced it, the new token is returned without
+    another round-trip.
+    """
+    with _TOKEN_LOCK:
+        needs_refresh = not TIKTOK_ACCESS_TOKEN or is_token_expired()
+        if stale_token is not None and stale_token == TIKTOK_ACCESS_TOKEN:
+            needs_refresh = True
+        if needs_refresh:
+            print("TikTok access token expired or invalid. Refreshing token...")
+            if not get_client_access_token():
+                print("Failed to refresh access token.")
+                return None
+        return TIKTOK_ACCESS_TOKEN
+
+def query_tiktok_ads(search_term, min_date, max_date, country_code=None, search_id=None,
+                     max_count=TIKTOK_QUERY_PAGE_SIZE, _retry_unauthorized=True):
+    """Query one page of TikTok Ads using the Commercial Content API.
+
+    Pass the ``search_id`` of the previous page to continue a paginated search.
+    """
+    access_token = get_access_token()
+    if not access_token:
+        return None
+
     url = "https://open.tiktokapis.com/v2/research/adlib/ad/query/"
     headers = {
-        "Authorization": f"Bearer {TIKTOK_ACCESS_TOKEN}",
+        "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json",
     }
     params = {
@@ -67,17 +104,24 @@ def query_tiktok_ads(search_term, min_date, max_date, country_code=None):
             },
             "country_code": country_code or "AT"
         },
+        "max_count": max_count,
     }
+    if search_id:
+        body["search_id"] = search_id
 
-    response = requests.post(url, headers=headers, params=params, json=body)
+    try:
+        response = http_client.post("tiktok", url, headers=headers, params=params, json=body)
+    except requests.RequestException as e:
+        print(f"Failed to query TikTok ads: {e}")
+        return None
     if response.status_code == 401:
-        print("Access token expired or invalid. Refreshing token...")
-        TIKTOK_ACCESS_TOKEN = get_client_access_token()
-        if TIKTOK_ACCESS_TOKEN:
-            return query_tiktok_ads(search_term, min_date, max_date, country_code=country_code)
-        else:
-            print("Failed to refresh access token.")
-            return None
+        if _retry_unauthorized and get_access_token(stale_token=access_token):
+            return query_tiktok_ads(
+                search_term, min_date, max_date, country_code=country_code, search_id=search_id,
+                max_count=max_count, _retry_unauthorized=False,
+            )
+        print("TikTok API rejected the access token.")
+        return None
     elif response.status_code == 200:
         try:
             data = response.json()
@@ -89,12 +133,44 @@ def query_tiktok_ads(search_term, min_date, max_date, country_code=None):
         print(f"Failed to query TikTok ads. Status code: {response.status_code}, Response: {response.text}")
         return None
 
+def iter_tiktok_ad_ids(search_term, min_date, max_date, max_results=500, country_code=None):
+    """Yield ad IDs page by page until ``max_results`` IDs were produced or TikTok has no more pages.
+
+    Raises TikTokQueryError when a page cannot be fetched.
+    """
+    search_id = None
+    yielded = 0
+    while yielded < max_results:
+        page_size = min(TIKTOK_QUERY_PAGE_SIZE, max_results - yielded)
+        ads_data = query_tiktok_ads(
+            search_term, min_date, max_date, country_code=country_code, search_id=search_id, max_count=page_size
+        )
+
+        # Check if "data" and "ads" keys exist and if "ads" is a list
+        data = (ads_data or {}).get("data")
+        if not isinstance(data, dict) or not isinstance(data.get("ads"), list):
+            raise TikTokQueryError(f"TikTok pagination for term '{search_term}' stopped after {yielded} ads.")
+
+        for ad in data["ads"]:
+            if "ad" in ad and "id" in ad["ad"]:
+                yield ad["ad"]["id"]
+                yielded += 1
+                if yielded >= max_results:
+                    return
+
+        search_id = data.get("search_id")
+        if not data.get("has_more") or not search_id:
+            return
+
 def get_ad_details(ad_id):
-    """Fetch details for a list of ad IDs using the TikTok API."""
-    global TIKTOK_ACCESS_TOKEN
+    """Fetch details for a single ad ID using the TikTok API."""
+    access_token = get_access_token()
+    if not access_token:
+        return None
+
     url = "https://open.tiktokapis.com/v2/research/adlib/ad/detail/"
     headers = {
-        "Authorization": f"Bearer {TIKTOK_ACCESS_TOKEN}",
+        "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json",
     }
     params = {
@@ -104,7 +180,11 @@ def get_ad_details(ad_id):
         "ad_id": ad_id,
     }
 
-    response = requests.post(url, headers=headers, params=params, json=body)
+    response = http_client.post("tiktok", url, headers=headers, params=params, json=body)
+    if response.status_code == 401:
+        # Refresh once (shared across workers) and let the caller's retry use the new token.
+        get_access_token(stale_token=access_token)
+        return None
     if response.status_code == 200:
         try:
             return response.json()
@@ -115,29 +195,87 @@ def get_ad_details(ad_id):
         print(f"Failed to fetch ad details. Status code: {response.status_code}, Response: {response.text}")
         return None
 
-def query_tiktok_ads_with_details(search_term, min_date, max_date, max_results=500, country_code=None):
-    """Query TikTok Ads and fetch details for all returned ads."""
-    max_results = int(max_results) if max_results else 500
-    ads_data = query_tiktok_ads(search_term, min_date, max_date, country_code=country_code)
+def _get_ad_details_with_retry(ad_id, retries):
+    """Fetch one ad's details, retrying failed attempts with a short linear backoff."""
+    for attempt in range(retries + 1):
+        try:
+            ad_details = get_ad_details(ad_id)
+        except http_client.CircuitOpenError as e:
+            print(f"Request for ad ID {ad_id} skipped: {e}")
+            return None
+        except requests.RequestException as e:
+            print(f"Request for ad ID {ad_id} failed: {e}")
+            ad_details = None
+        if ad_details:
+            return ad_details
+        if attempt < retries:
+            time.sleep(0.5 * (attempt + 1))
+    return None
 
-    # Check if "data" and "ads" keys exist and if "ads" is a list
-    if not ads_data or "data" not in ads_data or "ads" not in ads_data["data"] or not isinstance(ads_data["data"]["ads"], list):
-        print("No ads found or failed to query ads.")
-        return None
+def fetch_ad_details(ad_ids, max_workers=None, retries=None):
+    """Fetch details for many ad IDs in parallel. Results keep the order of ``ad_ids``;
+    ads that still fail after all retries are reported and left out, and the
+    result is then PartialResults.
 
-    # Extract ad IDs from the nested structure
-    ad_ids = [ad["ad"]["id"] for ad in ads_data["data"]["ads"] if "ad" in ad and "id" in ad["ad"]]
-    ad_ids = ad_ids[:max_results]
-    if not ad_ids:
-        return None
+    ``ad_ids`` may be a generator: IDs are taken one query page at a time, looked
+    up in the detail cache in bulk, and only the misses are submitted, so detail
+    requests for one page overlap with loading the next page.
+    """
+    max_workers = max(1, int(max_workers or TIKTOK_DETAIL_WORKERS))
+    retries = TIKTOK_DETAIL_RETRIES if retries is None else max(0, int(retries))
+
+    ad_ids = iter(ad_ids)
+    submitted = []  # (ad_id, cached details or None, future or None)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tiktok-detail") as executor:
+        while True:
+            page = list(islice(ad_ids, TIKTOK_QUERY_PAGE_SIZE))
+            if not page:
+                break
+            cached = TIKTOK_DETAIL_CACHE.get_many(page)
+            for ad_id in page:
+                if str(ad_id) in cached:
+                    submitted.append((ad_id, cached[str(ad_id)], None))
+                else:
+                    submitted.append((ad_id, None, executor.submit(_get_ad_details_with_retry, ad_id, retries)))
+        details = [(ad_id, cached or future.result(), future) for ad_id, cached, future in submitted]
+
+    cache_hits = sum(1 for _, _, future in details if future is None)
+    if cache_hits:
+        print(f"{cache_hits} of {len(details)} TikTok ad details served from the detail cache.")
+    TIKTOK_DETAIL_CACHE.put_many({
+        ad_id: ad_details for ad_id, ad_details, future in details if future is not None and ad_details
+    })
 
-    #print(f"Fetching details for {len(ad_ids)} ads...")
     ad_details_list = []
-    for ad_id in ad_ids:
-        ad_details = get_ad_details(ad_id)
+    for ad_id, ad_details, _ in details:
         if ad_details:
             ad_details_list.append(ad_details)
         else:
             print(f"Failed to fetch details for ad ID: {ad_id}")
+    if len(ad_details_list) < len(details):
+        return PartialResults(ad_details_list)
+    return ad_details_list
+
+def query_tiktok_ads_with_details(search_term, min_date, max_date, max_results=500, country_code=None, max_workers=None):
+    """Query TikTok Ads and fetch details for all returned ads.
+
+    Returns PartialResults when a query page or some ad details could not be fetched.
+    """
+    max_results = int(max_results) if max_results else 500
+    query_failed = False
+
+    def ad_ids():
+        nonlocal query_failed
+        try:
+            yield from iter_tiktok_ad_ids(
+                search_term, min_date, max_date, max_results=max_results, country_code=country_code
+            )
+        except TikTokQueryError as exc:
+            print(exc)
+            query_failed = True
 
+    # Details are fetched while later query pages are still loading.
+    ad_details_list = fetch_ad_details(ad_ids(), max_workers=max_workers)
+    if query_failed:
+        return PartialResults(ad_details_list)
     return ad_details_list
@@ -1,10 +1,104 @@
+import threading
 import time
 
-def rate_limited_request(request_func, *args, **kwargs):
-    try:
-        response = request_func(*args, **kwargs)
-        time.sleep(1)  # Prevent hitting API rate limits
-        return response
-    except Exception as e:
-        print(f"API request failed: {e}")
-        return None
+from config import PLATFORM_RATE_LIMITS
+
+
+class PartialResults(list):
+    """Results of a fetch that failed part-way: the ads collected before the error.
+
+    They are written like complete results, but never cached, so the next run
+    fetches the term again.
+    """
+
+
+class TokenBucket:
+    """Thread-safe token bucket that blocks callers until a request token is available."""
+
+    def __init__(self, rate_per_second, burst=1):
+        self.rate = float(rate_per_second)
+        self.capacity = max(1.0, float(burst))
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens=1):
+        """Take tokens from the bucket, sleeping while it is empty. A rate <= 0 disables limiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self.rate <= 0:
+                    break
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    break
+                wait_seconds = (tokens - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+            waited += wait_seconds
+
+        with self._lock:
+            if self._first_request is None:
+                self._first_request = time.monotonic()
+            self._request_count += tokens
+            self._waited_seconds += waited
+
+    def set_rate(self, rate_per_second):
+        """Change the refill rate at runtime, e.g. when an API reports its remaining budget."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate_per_second)
+
+    def reset_stats(self):
+        with self._lock:
+            self._first_request = None
+            self._request_count = 0
+            self._waited_seconds = 0.0
+
+    def stats(self):
+        """Return request count, achieved requests per second and total time spent waiting."""
+        with self._lock:
+            count = self._request_count
+            waited = self._waited_seconds
+            elapsed = time.monotonic() - self._first_request if self._first_request else 0.0
+        achieved_rate = count / elapsed if elapsed > 0 else float(count)
+        return {"requests": count, "requests_per_second": achieved_rate, "waited_seconds": waited}
+
+
+# One bucket per upstream quota: Meta Graph, TikTok research API, BigQuery jobs and Sheets writes.
+RATE_LIMITERS = {
+    platform: TokenBucket(limits["rate"], limits["burst"])
+    for platform, limits in PLATFORM_RATE_LIMITS.items()
+}
+
+
+def rate_limit(platform):
+    """Block until the platform's token bucket allows another request."""
+    limiter = RATE_LIMITERS.get(platform)
+    if limiter is not None:
+        limiter.acquire()
+
+
+def reset_rate_limit_stats():
+    for limiter in RATE_LIMITERS.values():
+        limiter.reset_stats()
+
+
+def print_rate_limit_report():
+    """Print the achieved request rate for every platform that was used in this run."""
+    for platform, limiter in RATE_LIMITERS.items():
+        stats = limiter.stats()
+        if not stats["requests"]:
+            continue
+        print(
+            f"[{platform}] {stats['requests']} requests, "
+            f"{stats['requests_per_second']:.2f} req/s achieved (limit {limiter.rate:.2f} req/s), "
+            f"{stats['waited_seconds']:.1f}s throttled"
+        )
@@ -0,0 +1,128 @@
+"""Crawl watermarks for incremental runs, one per platform, term and country.
+
+A watermark is the date window a complete fetch covered; failed fetches and
+fetches cut off at the result limit leave it unchanged. Incremental runs start
+each term's window at the end of its watermark (minus INCREMENTAL_OVERLAP_DAYS,
+to catch late-reported deliveries). When a term's window now starts before the
+covered window, the whole window is fetched again. Meta filters on delivery
+dates, so ads that are new or still running since the previous run are
+fetched again. TikTok filters on the publish date and Google on first_shown,
+so there an incremental run only picks up ads published or first shown since
+the previous run.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from config import CRAWL_STATE_PATH, INCREMENTAL_OVERLAP_DAYS
+
+
+def _to_date(value):
+    try:
+        return datetime.strptime(str(value), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+class CrawlWatermarks:
+    """SQLite store of the covered date window per (platform, term, country)."""
+
+    def __init__(self, path=CRAWL_STATE_PATH, overlap_days=INCREMENTAL_OVERLAP_DAYS):
+        self.path = path
+        self.overlap_days = max(0, int(overlap_days))
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        """Yield a connection for one transaction and close it once the block is done."""
+        if not self._ready:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                if not self._ready:
+                    connection.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS watermarks (
+                            platform TEXT NOT NULL,
+                            term TEXT NOT NULL,
+                            country_code TEXT NOT NULL,
+                            first_date TEXT,
+                            last_date TEXT NOT NULL,
+                            updated_at TEXT NOT NULL,
+                            PRIMARY KEY (platform, term, country_code)
+                        )
+                        """
+                    )
+                    columns = [row[1] for row in connection.execute("PRAGMA table_info(watermarks)")]
+                    if "first_date" not in columns:
+                        # State files written before windows were stored only know the last date.
+                        connection.execute("ALTER TABLE watermarks ADD COLUMN first_date TEXT")
+                    self._ready = True
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, platform, term, country_code):
+        """Return the covered window as ``(first date or None, last date)``, or None if never crawled.
+
+        The first date is None for watermarks stored before windows were recorded.
+        """
+        with self._lock, self._connect() as connection:
+            row = connection.execute(
+                "SELECT first_date, last_date FROM watermarks WHERE platform = ? AND term = ? AND country_code = ?",
+                [platform, term, country_code],
+            ).fetchone()
+        if not row or not _to_date(row[1]):
+            return None
+        return _to_date(row[0]) if row[0] else None, _to_date(row[1])
+
+    def window_start(self, platform, term, country_code, date_from, date_to):
+        """Return the yyyy-mm-dd start date of an incremental fetch for a term's date window.
+
+        Fetches end at ``date_to`` anyway, so only a window starting before the
+        covered one has a gap the resumed fetch would miss; it is fetched in full.
+        """
+        start, end = _to_date(date_from), _to_date(date_to)
+        covered = self.get(platform, term, country_code)
+        if not start or not end or not covered:
+            return date_from
+        first, last = covered
+        if first and start < first:
+            return date_from
+        resume = min(last - timedelta(days=self.overlap_days), end)
+        return max(start, resume).strftime("%Y-%m-%d")
+
+    def record(self, platform, term, country_code, date_from, date_to):
+        """Store a completely fetched window (ending no later than today).
+
+        A window that overlaps or adjoins the stored one extends it; otherwise
+        it replaces it.
+        """
+        start, end = _to_date(date_from), _to_date(date_to)
+        if not start or not end:
+            return
+        end = min(end, date.today())
+        covered = self.get(platform, term, country_code)
+        if covered:
+            first, last = covered
+            first = first or start
+            if start <= last + timedelta(days=1) and end >= first - timedelta(days=1):
+                start, end = min(start, first), max(end, last)
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO watermarks (platform, term, country_code, first_date, last_date, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    platform, term, country_code, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"),
+                    datetime.now().isoformat(timespec="seconds"),
+                ],
+            )
+
+
+WATERMARKS = CrawlWatermarks()
@@ -5,6 +5,7 @@ import hmac
 import json
 import os
 import re
+import threading
 import time
 import traceback
 from contextlib import redirect_stderr, redirect_stdout
@@ -14,7 +15,9 @@ from zoneinfo import ZoneInfo
 import streamlit as st
 
 from main import main
-from meta_ads import MetaTokenExpiredError, refresh_meta_access_token
+from config import META_FIELD_PROFILE
+from sinks import SINK_TYPES, parse_sink_names
+from meta_ads import META_FIELD_PROFILES, MetaTokenExpiredError, refresh_meta_access_token
 from screenshot_helper import generate_meta_screenshot_archive
 
 
@@ -44,7 +47,11 @@ def _safe_download_filename(file_name):
 
 
 class LiveUILogStream:
-    """File-like logger that renders output in a Streamlit text area immediately."""
+    """File-like logger that renders output in a Streamlit text area immediately.
+
+    Writes from crawler worker threads are buffered and shown with the next
+    render on the Streamlit script thread, which owns the UI placeholders.
+    """
 
     def __init__(self, placeholder, scroll_placeholder, title="Logs", max_chars=120000):
         self.placeholder = placeholder
@@ -53,27 +60,33 @@ class LiveUILogStream:
         self.max_chars = max_chars
         self._buffer = io.StringIO()
         self._scroll_nonce = 0
+        self._lock = threading.Lock()
+        self._owner_thread = threading.get_ident()
 
     def write(self, text):
         text = "" if text is None else str(text)
         if not text:
             return 0
 
-        self._buffer.write(text)
-        self._render()
+        with self._lock:
+            self._buffer.write(text)
+        if threading.get_ident() == self._owner_thread:
+            self._render()
         return len(text)
 
     def flush(self):
-        self._render()
+        if threading.get_ident() == self._owner_thread:
+            self._render()
 
     def log_line(self, message):
         self.write(f"{message}\n")
 
     def getvalue(self):
-        return self._buffer.getvalue()
+        with self._lock:
+            return self._buffer.getvalue()
 
     def _render(self):
-        text = self._buffer.getvalue()
+        text = self.getvalue()
         if len(text) > self.max_chars:
             text = text[-self.max_chars :]
         with self.placeholder.container():
@@ -293,6 +306,43 @@ with run_tab:
     st.caption(
         f"Aktuelles Limit pro Plattform und Suchbegriff: {int(max_results_all_platforms)}"
     )
+    meta_field_profile = st.selectbox(
+        "Meta Feldprofil",
+        options=list(META_FIELD_PROFILES.keys()),
+        index=list(META_FIELD_PROFILES.keys()).index(META_FIELD_PROFILE),
+        help="minimal: IDs und Snapshot-URLs, creative: + Werbetexte, reach: + Reichweite/Demografie, full: alle Felder.",
+    )
+    run_concurrently = st.checkbox(
+        "Plattformen parallel abfragen",
+        value=False,
+        help="Meta, TikTok und Google laufen gleichzeitig, begrenzt durch META/TIKTOK/GOOGLE_MAX_CONCURRENCY.",
+    )
+    use_meta_batch = st.checkbox(
+        "Meta Abfragen bündeln (Batch API)",
+        value=False,
+        help="Fasst die Meta Abfragen aller Suchbegriffe in Graph API Batch Requests mit bis zu 50 Anfragen zusammen.",
+    )
+    use_google_batch = st.checkbox(
+        "Google Abfragen bündeln (eine BigQuery Abfrage)",
+        value=False,
+        help="Gleicht alle Google-Suchbegriffe in einem einzigen Scan der BigQuery Tabelle ab.",
+    )
+    result_sinks = st.multiselect(
+        "Ausgabe",
+        options=list(SINK_TYPES.keys()),
+        default=parse_sink_names(),
+        help="sheets: Google Sheet, sqlite/parquet/csv: lokale Dateien unter RESULTS_DIR (auf Cloud Run nicht dauerhaft).",
+    )
+    refresh_cache = st.checkbox(
+        "Cache ignorieren (alles neu abrufen)",
+        value=False,
+        help="Fragt Meta, TikTok und Google neu ab, auch wenn gespeicherte Antworten noch gültig sind.",
+    )
+    incremental_run = st.checkbox(
+        "Inkrementell (nur neue und aktualisierte Anzeigen)",
+        value=False,
+        help="Behält bisherige Ergebnisse und fragt je Suchbegriff und Plattform nur den Zeitraum seit dem letzten Lauf ab. Bei TikTok und Google werden dabei nur neu veröffentlichte Anzeigen gefunden.",
+    )
     enable_meta_screenshots = st.checkbox(
         "Meta screenshots erstellen (manuell aktivieren)",
         value=False,
@@ -320,6 +370,13 @@ with run_tab:
                         collect_meta_ads=enable_meta_screenshots,
                         max_results_per_platform=int(max_results_all_platforms),
                         country_code=selected_country_code,
+                        concurrent=run_concurrently,
+                        meta_field_profile=meta_field_profile,
+                        meta_batch=use_meta_batch,
+                        google_batch=use_google_batch,
+                        sinks=result_sinks,
+                        refresh_cache=refresh_cache,
+                        incremental=incremental_run,
                     )
 
             st.session_state.pop("meta_screenshots_zip", None)
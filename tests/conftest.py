@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+
+
+@pytest.fixture
+def sheets(monkeypatch):
+    """google_sheets with application default credentials replaced, so no Google account is needed."""
+    import google.auth
+    import google.oauth2.credentials
+
+    monkeypatch.setattr(
+        google.auth, "default", lambda scopes=None: (google.oauth2.credentials.Credentials(token="test"), None)
+    )
+    import google_sheets
+
+    monkeypatch.setattr(google_sheets, "rate_limit", lambda platform: None)
+    return google_sheets
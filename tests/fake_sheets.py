@@ -0,0 +1,66 @@
+"""In-memory stand-ins for the gspread spreadsheet and worksheet calls the crawler makes."""
+import itertools
+
+import gspread
+
+_sheet_ids = itertools.count(1)
+
+
+class FakeWorksheet:
+    def __init__(self, title, rows, cols):
+        self.id = next(_sheet_ids)
+        self.title = title
+        self.row_count = int(rows)
+        self.col_count = int(cols)
+        self.values = []
+
+    def append_rows(self, rows, value_input_option=None):
+        self.values.extend(list(row) for row in rows)
+        self.row_count = max(self.row_count, len(self.values))
+        self.col_count = max([self.col_count] + [len(row) for row in rows])
+
+    def row_values(self, row):
+        return list(self.values[row - 1]) if len(self.values) >= row else []
+
+    def get_all_values(self):
+        return [list(row) for row in self.values]
+
+    def batch_get(self, ranges):
+        """Only whole-column ranges below the header such as "B2:B" are supported."""
+        results = []
+        for cell_range in ranges:
+            column = gspread.utils.a1_to_rowcol(cell_range.split(":")[0])[1] - 1
+            results.append([[row[column]] if len(row) > column else [] for row in self.values[1:]])
+        return results
+
+
+class FakeSpreadsheet:
+    def __init__(self, spreadsheet_id="main"):
+        self.id = spreadsheet_id
+        self.url = f"https://example.invalid/{spreadsheet_id}"
+        self.sheets = {}
+
+    def worksheet(self, title):
+        if title not in self.sheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.sheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        if title in self.sheets:
+            raise ValueError(f'A sheet with the name "{title}" already exists.')
+        sheet = self.sheets[title] = FakeWorksheet(title, rows, cols)
+        return sheet
+
+    def fetch_sheet_metadata(self):
+        return {
+            "sheets": [
+                {
+                    "properties": {
+                        "title": sheet.title,
+                        "sheetId": sheet.id,
+                        "gridProperties": {"rowCount": sheet.row_count, "columnCount": sheet.col_count},
+                    }
+                }
+                for sheet in self.sheets.values()
+            ]
+        }
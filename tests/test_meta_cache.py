@@ -0,0 +1,57 @@
+import pytest
+
+import main
+from meta_ads import MetaFetchError
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def meta_run(tmp_path, monkeypatch):
+    """run_meta_for_term with a private cache and two fake ads_archive pages."""
+    monkeypatch.setattr(main, "RESPONSE_CACHE", ResponseCache(path=str(tmp_path / "cache.sqlite")))
+    state = {"fetches": 0, "fail_page": None, "written": []}
+
+    def fake_pages(term, **kwargs):
+        state["fetches"] += 1
+        yield [{"id": "1"}, {"id": "2"}]
+        if state["fail_page"] == 2:
+            raise MetaFetchError("page 2 failed")
+        yield [{"id": "3"}]
+
+    monkeypatch.setattr(main, "iter_meta_ad_pages", fake_pages)
+    monkeypatch.setattr(main, "write_results", lambda platform, results, term: state["written"].extend(results))
+
+    def run():
+        return main.run_meta_for_term("term", "2024-01-01", "2024-01-31", 500, "AT")
+
+    return state, run
+
+
+def test_failed_write_still_caches_the_finished_fetch(meta_run, monkeypatch):
+    state, run = meta_run
+
+    def failing_write(platform, results, term):
+        raise RuntimeError("sheet write failed")
+
+    monkeypatch.setattr(main, "write_results", failing_write)
+    with pytest.raises(RuntimeError, match="sheet write failed"):
+        run()
+    assert state["fetches"] == 1
+
+    written = []
+    monkeypatch.setattr(main, "write_results", lambda platform, results, term: written.extend(results))
+    assert run() == [{"id": "1"}, {"id": "2"}, {"id": "3"}]
+    assert state["fetches"] == 1
+    assert written == [{"id": "1"}, {"id": "2"}, {"id": "3"}]
+
+
+def test_result_cut_short_by_a_fetch_error_is_not_cached(meta_run):
+    state, run = meta_run
+    state["fail_page"] = 2
+    results = run()
+    assert results == [{"id": "1"}, {"id": "2"}]
+    assert type(results).__name__ == "PartialResults"
+
+    state["fail_page"] = None
+    assert run() == [{"id": "1"}, {"id": "2"}, {"id": "3"}]
+    assert state["fetches"] == 2
@@ -0,0 +1,88 @@
+import pytest
+
+from fake_sheets import FakeSpreadsheet
+
+HEADERS = ["Timestamp", "Search Term", "Ad ID"]
+
+
+@pytest.fixture
+def workbook(sheets, monkeypatch):
+    spreadsheet = FakeSpreadsheet("main")
+    result_sheet = spreadsheet.add_worksheet("Results_TikTok", rows=1, cols=len(HEADERS))
+    result_sheet.append_rows([HEADERS])
+    monkeypatch.setattr(sheets, "open_spreadsheet", lambda sheet_id=None: spreadsheet)
+    monkeypatch.setattr(sheets, "GOOGLE_SHEET_ID", "main")
+    monkeypatch.setattr(sheets, "GOOGLE_SHEET_POOL_IDS", [])
+    monkeypatch.setattr(sheets, "SHEETS_FULL_POLICY", "rollover")
+    # Five grid rows of three columns per shard.
+    monkeypatch.setattr(sheets, "SHEETS_SHARD_MAX_CELLS", 15)
+    return spreadsheet
+
+
+def start_run(sheets, incremental=False):
+    sheets.start_workbook_session()
+    if incremental:
+        sheets.resume_result_shards()
+    return sheets.WORKBOOK.worksheet("Results_TikTok")
+
+
+def rows(start, count):
+    return [["2024-01-01 00:00:00", "term", str(ad_id)] for ad_id in range(start, start + count)]
+
+
+def index_entries(spreadsheet):
+    return [(row[1], row[2], row[3]) for row in spreadsheet.sheets["Results_Index"].values[1:]]
+
+
+def test_full_shard_rolls_over_to_a_sheet_sized_for_the_rows(sheets, workbook):
+    sheet = start_run(sheets)
+    sheets.RESULT_SHARDS.append(sheet, rows(1, 3))
+    sheets.RESULT_SHARDS.append(sheet, rows(4, 3))
+
+    shard = workbook.sheets["Results_TikTok_2"]
+    assert workbook.sheets["Results_TikTok"].values[1:] == rows(1, 3)
+    assert shard.values == [HEADERS] + rows(4, 3)
+    assert shard.row_count == 4
+    assert index_entries(workbook) == [
+        ("Results_TikTok", 1, "Results_TikTok"),
+        ("Results_TikTok", 2, "Results_TikTok_2"),
+    ]
+
+
+def test_incremental_run_continues_in_the_last_indexed_shard(sheets, workbook):
+    sheet = start_run(sheets)
+    sheets.RESULT_SHARDS.append(sheet, rows(1, 3))
+    sheets.RESULT_SHARDS.append(sheet, rows(4, 3))
+
+    sheet = start_run(sheets, incremental=True)
+    sheets.RESULT_SHARDS.append(sheet, rows(7, 3))
+
+    assert workbook.sheets["Results_TikTok"].values[1:] == rows(1, 3)
+    assert workbook.sheets["Results_TikTok_2"].values[1:] == rows(4, 3)
+    assert workbook.sheets["Results_TikTok_3"].values == [HEADERS] + rows(7, 3)
+    assert index_entries(workbook)[-1] == ("Results_TikTok", 3, "Results_TikTok_3")
+
+
+def test_rollover_skips_shard_titles_that_are_taken(sheets, workbook):
+    workbook.add_worksheet("Results_TikTok_2", rows=1, cols=1)
+    sheet = start_run(sheets)
+    sheets.RESULT_SHARDS.append(sheet, rows(1, 3))
+    sheets.RESULT_SHARDS.append(sheet, rows(4, 3))
+
+    assert workbook.sheets["Results_TikTok_2"].values == []
+    assert workbook.sheets["Results_TikTok_3"].values == [HEADERS] + rows(4, 3)
+    assert index_entries(workbook)[-1] == ("Results_TikTok", 3, "Results_TikTok_3")
+
+
+def test_incremental_run_skips_ads_written_to_any_shard(sheets, workbook):
+    sheet = start_run(sheets)
+    sheets.RESULT_SHARDS.append(sheet, rows(1, 3))
+    sheets.RESULT_SHARDS.append(sheet, rows(4, 3))
+    assert sheets.WRITTEN_ADS.unwritten("Results_TikTok", rows(1, 3)) == rows(1, 3)
+
+    start_run(sheets, incremental=True)
+
+    assert sheets.WRITTEN_ADS.unwritten("Results_TikTok", rows(2, 7)) == rows(7, 2)
+    assert sheets.WRITTEN_ADS.unwritten("Results_TikTok", rows(8, 2)) == rows(9, 1)
+    other_term = [["2024-01-01 00:00:00", "other term", "1"]]
+    assert sheets.WRITTEN_ADS.unwritten("Results_TikTok", other_term) == other_term
@@ -0,0 +1,13 @@
+import pytest
+
+import sinks
+
+
+@pytest.mark.parametrize("names", ["csv", "sqlite,parquet"])
+def test_incremental_runs_refuse_append_only_sinks(names, tmp_path, monkeypatch):
+    monkeypatch.setattr(sinks, "RESULTS_DIR", str(tmp_path))
+
+    with pytest.raises(ValueError, match="only append"):
+        sinks.start_sinks(names, incremental=True)
+
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,86 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from watermarks import CrawlWatermarks
+
+
+@pytest.fixture
+def watermarks(tmp_path):
+    return CrawlWatermarks(path=str(tmp_path / "state.sqlite"), overlap_days=2)
+
+
+def test_unknown_term_fetches_the_requested_window(watermarks):
+    assert watermarks.window_start("meta", "term", "AT", "2024-01-01", "2024-01-31") == "2024-01-01"
+
+
+def test_covered_window_resumes_before_its_end(watermarks):
+    watermarks.record("meta", "term", "AT", "2024-01-01", "2024-01-20")
+
+    assert watermarks.window_start("meta", "term", "AT", "2024-01-01", "2024-01-31") == "2024-01-18"
+    assert watermarks.window_start("meta", "term", "AT", "2024-01-19", "2024-01-31") == "2024-01-19"
+    assert watermarks.window_start("meta", "term", "DE", "2024-01-01", "2024-01-31") == "2024-01-01"
+
+
+def test_earlier_date_from_fetches_the_whole_window_again(watermarks):
+    watermarks.record("meta", "term", "AT", "2024-01-10", "2024-01-20")
+
+    assert watermarks.window_start("meta", "term", "AT", "2024-01-01", "2024-01-31") == "2024-01-01"
+
+
+def test_adjoining_windows_merge_and_gaps_replace(watermarks):
+    watermarks.record("meta", "term", "AT", "2024-01-10", "2024-01-20")
+    watermarks.record("meta", "term", "AT", "2024-01-18", "2024-01-31")
+    watermarks.record("meta", "term", "AT", "2024-01-01", "2024-01-09")
+    assert watermarks.get("meta", "term", "AT") == (date(2024, 1, 1), date(2024, 1, 31))
+
+    watermarks.record("meta", "term", "AT", "2024-03-01", "2024-03-31")
+    assert watermarks.get("meta", "term", "AT") == (date(2024, 3, 1), date(2024, 3, 31))
+    assert watermarks.window_start("meta", "term", "AT", "2024-01-01", "2024-03-31") == "2024-01-01"
+
+
+def test_window_end_is_capped_at_today(watermarks):
+    watermarks.record("meta", "term", "AT", "2024-01-01", "2099-12-31")
+
+    assert watermarks.get("meta", "term", "AT") == (date(2024, 1, 1), date.today())
+    today = date.today()
+    assert watermarks.window_start("meta", "term", "AT", "2024-01-01", "2099-12-31") == (
+        (today - timedelta(days=2)).strftime("%Y-%m-%d")
+    )
+
+
+def test_watermarks_without_a_stored_start_are_migrated(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE watermarks (platform TEXT NOT NULL, term TEXT NOT NULL, country_code TEXT NOT NULL, "
+            "last_date TEXT NOT NULL, updated_at TEXT NOT NULL, PRIMARY KEY (platform, term, country_code))"
+        )
+        connection.execute("INSERT INTO watermarks VALUES ('meta', 'term', 'AT', '2024-01-20', '2024-01-20T00:00:00')")
+    connection.close()
+    watermarks = CrawlWatermarks(path=path, overlap_days=2)
+
+    assert watermarks.get("meta", "term", "AT") == (None, date(2024, 1, 20))
+    assert watermarks.window_start("meta", "term", "AT", "2024-01-01", "2024-01-31") == "2024-01-18"
+    watermarks.record("meta", "term", "AT", "2024-01-18", "2024-01-31")
+    assert watermarks.get("meta", "term", "AT") == (date(2024, 1, 18), date(2024, 1, 31))
+
+
+def test_connections_are_closed_after_each_use(watermarks, monkeypatch):
+    opened = []
+    connect = sqlite3.connect
+
+    def tracking_connect(*args, **kwargs):
+        connection = connect(*args, **kwargs)
+        opened.append(connection)
+        return connection
+
+    monkeypatch.setattr(sqlite3, "connect", tracking_connect)
+    watermarks.record("meta", "term", "AT", "2024-01-01", "2024-01-20")
+    watermarks.get("meta", "term", "AT")
+
+    assert opened
+    for connection in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")